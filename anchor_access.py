@@ -0,0 +1,85 @@
+"""
+Tracking of anchor columns a strategy looks up without declaring them.
+
+The runner passes generate_signals only the anchor columns declared in
+get_coin_metadata(). tracked_anchors() swaps that frame's column index for
+AnchorColumns, which reports every lookup of a missing open/high/low/close/
+volume_* name to the tracker active in the current thread. That covers
+frame[name], name in frame, name in frame.columns and columns.get_loc(name).
+Frames sliced, copied or re-indexed from it keep the index type and stay
+tracked. A frame built by merging it onto another frame does not, so callers
+still treat a failing strategy as a possible undeclared access.
+"""
+import re
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+ANCHOR_NAME_PATTERN = re.compile(r"(?:open|high|low|close|volume)_")
+
+_active = threading.local()
+
+
+class UndeclaredAnchorError(KeyError):
+    """Raised in strict mode when a strategy looks up an anchor column it did not declare"""
+
+
+class AnchorAccessTracker:
+    """
+    Undeclared anchor column names looked up while the tracker is active.
+
+    Args:
+        strict: raise UndeclaredAnchorError at the first such lookup instead of
+            only recording it
+    """
+
+    def __init__(self, strict: bool = False):
+        self.strict = strict
+        self.undeclared = []
+
+    def lookup(self, key, present: bool):
+        if present or not isinstance(key, str) or not ANCHOR_NAME_PATTERN.match(key):
+            return
+        if key not in self.undeclared:
+            self.undeclared.append(key)
+        if self.strict:
+            raise UndeclaredAnchorError(f"Strategy accessed anchor columns not declared in get_coin_metadata(): {[key]}")
+
+
+def _report(key, present: bool):
+    tracker = getattr(_active, "tracker", None)
+    if tracker is not None:
+        tracker.lookup(key, present)
+
+
+class AnchorColumns(pd.Index):
+    """Column index that reports lookups of missing names to the active tracker"""
+
+    def __contains__(self, key) -> bool:
+        present = super().__contains__(key)
+        _report(key, present)
+        return present
+
+    def get_loc(self, key):
+        if isinstance(key, str):
+            _report(key, super().__contains__(key))
+        return super().get_loc(key)
+
+
+def tracked_anchors(candles_anchor: pd.DataFrame) -> pd.DataFrame:
+    """Shallow copy of candles_anchor whose column lookups are tracked"""
+    tracked = candles_anchor.copy(deep=False)
+    tracked.columns = AnchorColumns._simple_new(candles_anchor.columns._values, name=candles_anchor.columns.name)
+    return tracked
+
+
+@contextmanager
+def track_anchor_access(strict: bool = False):
+    """Activates an AnchorAccessTracker for the current thread and yields it"""
+    tracker = AnchorAccessTracker(strict)
+    previous = getattr(_active, "tracker", None)
+    _active.tracker = tracker
+    try:
+        yield tracker
+    finally:
+        _active.tracker = previous
@@ -0,0 +1,185 @@
+"""
+Incremental builder for the wide candles_anchor_all panel.
+
+The panel is stored partitioned as candle_data/anchor_panel/{SYMBOL}_{TF}/{YYYY-MM}.parquet,
+one directory per anchor series and one file per month, plus a manifest
+holding a content hash per partition. update() rebuilds a series from the
+symbol's 1h cache produced by data_fetcher and rewrites only the monthly
+partitions whose contents changed; other symbols' columns are never
+touched. export() assembles the single candles_anchor_all.parquet file the
+evaluation runner reads.
+
+Usage:
+    python anchor_panel.py BTC ETH SOL
+"""
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from data_fetcher import (
+    ANCHOR_FIELDS, ANCHOR_FILE, BASE_TIMEFRAME, _atomic_to_parquet, _cache_path, fetch_target_data, get_time_grid,
+    resample_candles,
+)
+
+PANEL_DIR = "candle_data/anchor_panel"
+MANIFEST_FILE = "manifest.json"
+PANEL_TIMEFRAMES = ("1H", "4H", "1D")
+
+
+class AnchorPanel:
+    def __init__(self, root: str = PANEL_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"series": {}}
+
+    def series(self) -> list:
+        """(symbol, timeframe) pairs in the panel, in column order."""
+        return [(entry["symbol"], entry["timeframe"]) for entry in self.manifest["series"].values()]
+
+    def columns(self) -> list:
+        columns = ["timestamp"]
+        for symbol, timeframe in self.series():
+            columns += [f"{field}_{symbol}_{timeframe}" for field in ANCHOR_FIELDS]
+        return columns
+
+    def series_frame(self, symbol: str, timeframe: str, base: pd.DataFrame) -> pd.DataFrame:
+        """
+        One anchor series on the hourly grid, with panel column names.
+
+        Coarser timeframes are aggregated from the 1h candles and placed at
+        their bar's open time, leaving the hours in between empty, which is
+        how candles_anchor_all stores 4H and 1D bars.
+        """
+        grid = get_time_grid(BASE_TIMEFRAME)
+        if timeframe.lower() == BASE_TIMEFRAME:
+            bars = base
+        else:
+            bars = resample_candles(base, timeframe.lower())
+        aligned = grid.align(bars[["timestamp"] + ANCHOR_FIELDS])
+        return aligned.rename(columns={field: f"{field}_{symbol}_{timeframe}" for field in ANCHOR_FIELDS})
+
+    def update(self, symbols: list, timeframes: tuple = PANEL_TIMEFRAMES) -> list:
+        """
+        Adds or refreshes anchor symbols from their per-symbol 1h caches.
+
+        Args:
+            symbols: coin symbols like ['BTC', 'ETH']
+            timeframes: panel timeframes to build for each symbol
+
+        Returns:
+            list of partition paths that were (re)written
+        """
+        written = []
+        for symbol in symbols:
+            symbol = symbol.upper()
+            base_file = _cache_path(symbol, BASE_TIMEFRAME)
+            if not os.path.exists(base_file):
+                fetch_target_data(symbol, BASE_TIMEFRAME)
+            if not os.path.exists(base_file):
+                print(f"No 1h data available for {symbol}, skipping")
+                continue
+            base = pd.read_parquet(base_file)
+
+            for timeframe in timeframes:
+                timeframe = timeframe.upper()
+                written += self._update_series(symbol, timeframe, self.series_frame(symbol, timeframe, base))
+
+        self._save_manifest()
+        print(f"Anchor panel updated: {len(written)} partitions written")
+        return written
+
+    def _update_series(self, symbol: str, timeframe: str, frame: pd.DataFrame) -> list:
+        key = f"{symbol}_{timeframe}"
+        entry = self.manifest["series"].setdefault(key, {"symbol": symbol, "timeframe": timeframe, "partitions": {}})
+        series_dir = os.path.join(self.root, key)
+
+        written = []
+        months = frame["timestamp"].dt.strftime("%Y-%m").to_numpy()
+        boundaries = np.flatnonzero(months[1:] != months[:-1]) + 1
+        for rows in np.split(np.arange(len(frame)), boundaries):
+            if len(rows) == 0:
+                continue
+            month = months[rows[0]]
+            partition = frame.iloc[rows[0]:rows[-1] + 1]
+            digest = _frame_digest(partition)
+            path = os.path.join(series_dir, f"{month}.parquet")
+            if entry["partitions"].get(month) == digest and os.path.exists(path):
+                continue
+            _atomic_to_parquet(partition.reset_index(drop=True), path)
+            entry["partitions"][month] = digest
+            written.append(path)
+        return written
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def load(self, columns: list = None) -> pd.DataFrame:
+        """
+        Assembles the wide panel on the current hourly grid.
+
+        Only the series and monthly partitions needed for the requested
+        columns and grid range are read.
+        """
+        grid = get_time_grid(BASE_TIMEFRAME)
+        wanted = set(columns) if columns is not None else None
+        months = set(pd.DatetimeIndex(grid.timestamps).strftime("%Y-%m"))
+
+        result = {"timestamp": grid.timestamps.copy()}
+        for key, entry in self.manifest["series"].items():
+            series_columns = [f"{field}_{key}" for field in ANCHOR_FIELDS]
+            if wanted is not None:
+                series_columns = [column for column in series_columns if column in wanted]
+            if not series_columns:
+                continue
+            paths = [
+                os.path.join(self.root, key, f"{month}.parquet")
+                for month in sorted(entry["partitions"]) if month in months
+            ]
+            if paths:
+                parts = pd.concat(
+                    [pd.read_parquet(path, columns=["timestamp"] + series_columns) for path in paths],
+                    ignore_index=True,
+                )
+                aligned = grid.align(parts)
+            else:
+                aligned = grid.frame()
+            for column in series_columns:
+                result[column] = aligned[column].to_numpy() if column in aligned else np.full(len(grid), np.nan)
+
+        if columns is not None:
+            missing = [column for column in columns if column not in result]
+            if missing:
+                raise KeyError(f"Columns not in anchor panel: {missing}")
+            return pd.DataFrame({column: result[column] for column in columns})
+        return pd.DataFrame(result)
+
+    def export(self, path: str = ANCHOR_FILE) -> str:
+        """Writes the assembled panel as the single parquet file the runner reads."""
+        panel = self.load()
+        _atomic_to_parquet(panel, path)
+        print(f"✅ SAVED anchor panel with {len(panel.columns) - 1} columns to {path}")
+        return path
+
+
+def _frame_digest(frame: pd.DataFrame) -> str:
+    digest = hashlib.sha1()
+    for column in frame.columns:
+        digest.update(column.encode())
+        digest.update(np.ascontiguousarray(frame[column].to_numpy()).tobytes())
+    return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    panel = AnchorPanel()
+    panel.update(sys.argv[1:] or [symbol for symbol, _ in panel.series()])
+    panel.export()
@@ -0,0 +1,231 @@
+"""
+Evaluate many strategies in parallel across a process pool.
+
+The parent loads every candle series the batch needs once and writes it to
+the memory-mapped CandleStore; workers open those datasets read-only, so all
+processes share one page-cache copy instead of re-reading parquet per task.
+Results are yielded as each strategy finishes, and a strategy that fails
+becomes a failed result instead of aborting the batch. A strategy that kills
+its worker process (os._exit, a segfault, the OOM killer) breaks the whole
+pool, which fails every task still queued on it. The strategies left
+unfinished are then re-run in one process each, so only the one that crashed
+comes back failed. With a memory budget, each worker also caps its address
+space, so a runaway allocation fails its own strategy with MemoryError.
+
+Usage:
+    python batch_runner.py [STRATEGY_ID ...] [--workers N] [--from-files]
+"""
+import io
+import os
+import sys
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import data_fetcher
+from candle_store import CandleStore, STORE_DIR
+from evaluation_runner import load_strategy_module, run_strategy_evaluation
+from profiling import limit_address_space
+from stage_cache import file_fingerprint
+from strategy_config import STRATEGIES
+
+ANCHOR_DATASET = "candles_anchor_all"
+
+
+def default_strategy_ids(from_files: bool = False) -> list:
+    """Strategy ids from strategy_config.STRATEGIES, or every file in Strategies/"""
+    if from_files:
+        return sorted(
+            os.path.splitext(name)[0] for name in os.listdir("Strategies")
+            if name.endswith(".py") and not name.startswith("_")
+        )
+    return [strategy["id"] for strategy in STRATEGIES]
+
+
+class StoreCandleSource:
+    """
+    Candle source backed by CandleStore datasets, for run_strategy_evaluation.
+
+    Frames are memory-mapped copy-on-write, so a strategy that modifies its
+    input only changes its own process's pages.
+    """
+
+    def __init__(self, store_root: str, anchor_dataset: str, targets: dict):
+        self.store_root = store_root
+        self.anchor_dataset = anchor_dataset
+        self.targets = targets
+
+    def anchor_candles(self, columns: list = None):
+        return CandleStore(self.store_root).load(self.anchor_dataset, columns)
+
+    def target_candles(self, symbol: str, timeframe: str):
+        name = self.targets.get((symbol.upper(), timeframe.lower()))
+        if name is None:
+            return data_fetcher.fetch_target_data(symbol, timeframe)
+        return CandleStore(self.store_root).load(name)
+
+    def fingerprint(self, symbol: str, timeframe: str) -> dict:
+        store = CandleStore(self.store_root)
+        name = self.targets.get((symbol.upper(), timeframe.lower()))
+        return {
+            "anchor": store.meta(self.anchor_dataset)["source"],
+            "target": store.meta(name)["source"] if name else file_fingerprint(
+                data_fetcher._cache_path(symbol, data_fetcher.BASE_TIMEFRAME)
+            ),
+        }
+
+
+def prepare_candle_source(strategy_ids: list, store_root: str = STORE_DIR) -> StoreCandleSource:
+    """
+    Loads the anchor panel and each distinct target series once into the store.
+
+    Datasets whose source cache and time grid are unchanged since the last
+    batch are reused as they are.
+    """
+    store = CandleStore(store_root)
+    store.import_parquet(data_fetcher.ANCHOR_FILE, ANCHOR_DATASET)
+
+    targets = {}
+    for strategy_id in strategy_ids:
+        try:
+            target = load_strategy_module(strategy_id).get_coin_metadata().get("target", {})
+        except Exception as e:
+            # Reported by the strategy's own evaluation
+            print(f"Could not read metadata for {strategy_id}: {e}")
+            continue
+        if not target.get("symbol"):
+            continue
+        key = (target["symbol"].upper(), target.get("timeframe", "1h").lower())
+        if key not in targets:
+            targets[key] = _store_target(store, *key)
+
+    return StoreCandleSource(store_root, ANCHOR_DATASET, targets)
+
+
+def _store_target(store: CandleStore, symbol: str, timeframe: str) -> str:
+    name = f"target_{symbol.lower()}_{timeframe}"
+    cache_file = data_fetcher._cache_path(symbol, data_fetcher.BASE_TIMEFRAME)
+    grid = data_fetcher.get_time_grid(timeframe)
+
+    def fingerprint():
+        if not os.path.exists(cache_file):
+            return None
+        stat = os.stat(cache_file)
+        return {
+            "path": os.path.abspath(cache_file), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+            "timeframe": timeframe, "grid": [int(grid.start_ns), len(grid)],
+        }
+
+    source = fingerprint()
+    if source is not None and store.has(name) and store.meta(name).get("source") == source:
+        return name
+    candles = data_fetcher.fetch_target_data(symbol, timeframe)
+    store.write(name, candles, source=fingerprint())
+    return name
+
+
+_worker_source = None
+
+
+def _init_worker(candle_source, memory_budget_mb: float = None):
+    global _worker_source
+    _worker_source = candle_source
+    if memory_budget_mb is not None:
+        limit_address_space(int(memory_budget_mb * 2**20))
+
+
+def _evaluate(strategy_id: str, strict_anchors: bool, compact: bool, memory_budget_mb: float = None) -> dict:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = run_strategy_evaluation(strategy_id, strict_anchors, compact, candle_source=_worker_source,
+                                         memory_budget_mb=memory_budget_mb)
+    # Early-exit errors from the runner carry only an 'error' key
+    result.setdefault("strategy_name", strategy_id)
+    result.setdefault("status", "failed")
+    result["log"] = output.getvalue()
+    return result
+
+
+def _evaluate_isolated(strategy_id: str, candle_source, strict_anchors: bool, compact: bool,
+                       memory_budget_mb: float = None) -> dict:
+    """Evaluates one strategy in a worker process of its own"""
+    with ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(candle_source, memory_budget_mb)) as pool:
+        try:
+            return pool.submit(_evaluate, strategy_id, strict_anchors, compact, memory_budget_mb).result()
+        except BrokenProcessPool:
+            return {"strategy_name": strategy_id, "status": "failed", "error": "Worker process died during evaluation"}
+        except Exception as e:
+            return {"strategy_name": strategy_id, "status": "failed", "error": f"Worker failed: {e!r}"}
+
+
+def run_batch_evaluation(strategy_ids: list = None, max_workers: int = None, strict_anchors: bool = False,
+                         compact: bool = False, store_root: str = STORE_DIR, memory_budget_mb: float = None):
+    """
+    Evaluates strategies across a process pool.
+
+    Args:
+        strategy_ids: strategies to run; defaults to strategy_config.STRATEGIES
+        max_workers: pool size (defaults to the CPU count)
+        strict_anchors, compact: passed through to run_strategy_evaluation
+        store_root: CandleStore directory used to share candles with workers
+        memory_budget_mb: per-strategy RSS growth limit (see run_strategy_evaluation);
+            also caps each worker's address space at its startup size plus
+            the budget and profiling.ADDRESS_SPACE_HEADROOM
+
+    Yields:
+        (strategy_id, result dict) in completion order; each worker's printed
+        progress is kept in result['log']
+    """
+    strategy_ids = list(strategy_ids) if strategy_ids is not None else default_strategy_ids()
+    candle_source = prepare_candle_source(strategy_ids, store_root)
+
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(candle_source, memory_budget_mb)) as pool:
+        futures = {
+            pool.submit(_evaluate, strategy_id, strict_anchors, compact, memory_budget_mb): strategy_id
+            for strategy_id in strategy_ids
+        }
+        for future in as_completed(futures):
+            strategy_id = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                unfinished.append(strategy_id)
+                continue
+            except Exception as e:
+                result = {"strategy_name": strategy_id, "status": "failed", "error": f"Worker failed: {e!r}"}
+            yield strategy_id, result
+
+    if unfinished:
+        # Any of these may have crashed the pool; isolated, a crash fails only its own strategy
+        print(f"A worker process died; re-running {len(unfinished)} unfinished strategies in one process each")
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as threads:
+            futures = {
+                threads.submit(_evaluate_isolated, strategy_id, candle_source, strict_anchors, compact, memory_budget_mb): strategy_id
+                for strategy_id in unfinished
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate strategies in parallel")
+    parser.add_argument("strategy_ids", nargs="*", help="strategy ids (default: every configured strategy)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--from-files", action="store_true", help="run every file in Strategies/")
+    parser.add_argument("--strict-anchors", action="store_true")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--memory-budget-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    ids = args.strategy_ids or default_strategy_ids(args.from_files)
+    failures = 0
+    for strategy_id, result in run_batch_evaluation(ids, args.workers, args.strict_anchors, args.compact,
+                                                     memory_budget_mb=args.memory_budget_mb):
+        if result.get("status") == "completed":
+            print(f"✅ {strategy_id}: {result['return_percentage']:.2f}% return, "
+                  f"{result['total_trades']} trades, max drawdown {result['max_drawdown_percentage']:.2f}%")
+        else:
+            failures += 1
+            print(f"❌ {strategy_id}: {result.get('error')}")
+    sys.exit(1 if failures else 0)
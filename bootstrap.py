@@ -0,0 +1,85 @@
+"""
+Monte Carlo bootstrap of trade logs.
+
+Resamples the per-trade price returns (tradelog 'PnL') of one backtest into
+many alternative trade sequences, compounds each with the simulator's fee
+model (entry fee, trade return, exit fee) and scores every path with the
+vectorized metrics in metrics.py. Paths are drawn as one 2D array per chunk,
+so memory stays bounded by chunk_size x trades however many paths are drawn.
+"""
+import numpy as np
+import pandas as pd
+from metrics import trade_metrics
+
+BOOTSTRAP_METRICS = ("return_percentage", "max_drawdown_percentage", "sharpe_ratio")
+
+
+def resample_returns(pnl, n_paths: int, block_size: int = 1, rng=None) -> np.ndarray:
+    """
+    Bootstrap paths of trade returns.
+
+    Args:
+        pnl: per-trade returns of one backtest
+        n_paths: number of paths to draw
+        block_size: 1 for the i.i.d. bootstrap; larger values draw runs of
+            consecutive trades (circular block bootstrap) to keep streaks
+        rng: numpy Generator (or seed)
+
+    Returns:
+        (n_paths, trades) array of resampled returns
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    rng = np.random.default_rng(rng)
+    n_trades = len(pnl)
+    if n_trades == 0:
+        return np.empty((n_paths, 0))
+    if block_size <= 1:
+        return pnl[rng.integers(0, n_trades, size=(n_paths, n_trades))]
+
+    n_blocks = -(-n_trades // block_size)
+    starts = rng.integers(0, n_trades, size=(n_paths, n_blocks, 1))
+    index = (starts + np.arange(block_size)) % n_trades
+    return pnl[index.reshape(n_paths, -1)[:, :n_trades]]
+
+
+def compound_returns(returns: np.ndarray, initial_capital: float = 1000.0, fee_pct: float = 0.001) -> np.ndarray:
+    """Capital after each trade, paying fee_pct on entry and on exit like TradeSimulator"""
+    growth = (1 - fee_pct) * (1 + returns) * (1 - fee_pct)
+    return initial_capital * np.cumprod(growth, axis=-1)
+
+
+def bootstrap_metrics(pnl, n_paths: int = 10000, block_size: int = 1, initial_capital: float = 1000.0,
+                      fee_pct: float = 0.001, seed=None, chunk_size: int = 2000,
+                      metrics: tuple = BOOTSTRAP_METRICS) -> dict:
+    """
+    Metric distributions over bootstrap paths of a tradelog's PnL.
+
+    Args:
+        pnl: tradelog['PnL'] from TradeSimulator.run
+        n_paths: number of bootstrap paths
+        block_size: see resample_returns
+        initial_capital, fee_pct: simulator settings used to compound the paths
+        seed: seed (or numpy Generator) for reproducible draws
+        chunk_size: paths resampled and scored together
+        metrics: names of metrics.trade_metrics figures to collect
+
+    Returns:
+        dict of metric name -> (n_paths,) array
+    """
+    rng = np.random.default_rng(seed)
+    collected = {name: [] for name in metrics}
+    for start in range(0, n_paths, chunk_size):
+        paths = resample_returns(pnl, min(chunk_size, n_paths - start), block_size, rng)
+        scores = trade_metrics(paths, compound_returns(paths, initial_capital, fee_pct), initial_capital)
+        for name in metrics:
+            collected[name].append(scores[name])
+    return {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in collected.items()}
+
+
+def confidence_intervals(distributions: dict, quantiles: tuple = (0.05, 0.5, 0.95)) -> pd.DataFrame:
+    """Quantiles of each bootstrap metric distribution, one row per metric"""
+    return pd.DataFrame(
+        {f"p{round(q * 100):02d}": [np.nanquantile(values, q) if np.any(~np.isnan(values)) else np.nan for values in distributions.values()]
+         for q in quantiles},
+        index=list(distributions),
+    )
@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+STORE_DIR = "candle_data/store"
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"
+# Reads retried when a concurrent write retires the version being opened
+READ_ATTEMPTS = 3
+
+
+class CandleStore:
+    """
+    Uncompressed columnar candle store opened with mmap.
+
+    Each dataset lives in its own directory, one version subdirectory per
+    write with one .npy file per column plus a meta.json, and a CURRENT file
+    naming the live version. A write switches CURRENT atomically and keeps
+    the version it replaced, so a concurrent reader never sees a partial
+    dataset or a missing directory. Loading memory-maps the column files
+    copy-on-write, so every process reading the same dataset shares one
+    page-cache copy and a load costs no decompression or parsing. Writes to a loaded frame
+    stay private to that process and never reach the files.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+
+    def _dataset_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _current(self, name: str) -> dict:
+        """Contents of the dataset's CURRENT file, or None before its first write"""
+        try:
+            with open(os.path.join(self._dataset_dir(name), CURRENT_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _version_dir(self, name: str) -> str:
+        current = self._current(name)
+        if current is None:
+            raise FileNotFoundError(f"No dataset {name} in candle store {self.root}")
+        return os.path.join(self._dataset_dir(name), current["version"])
+
+    def _read(self, name: str, read):
+        """Calls read(version_dir), retrying if a concurrent write retired that version"""
+        for attempt in range(READ_ATTEMPTS):
+            version_dir = self._version_dir(name)
+            try:
+                return read(version_dir)
+            except FileNotFoundError:
+                if attempt == READ_ATTEMPTS - 1 or self._version_dir(name) == version_dir:
+                    raise
+
+    def names(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            entry for entry in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, entry, CURRENT_FILE))
+        )
+
+    def has(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self._dataset_dir(name), CURRENT_FILE))
+
+    def meta(self, name: str) -> dict:
+        return self._read(name, _read_meta)
+
+    def write(self, name: str, df: pd.DataFrame, source: dict = None):
+        """
+        Persists a DataFrame as one .npy file per column.
+
+        The data goes into a new version directory and CURRENT is replaced
+        to point at it, so readers see either the old or the new version,
+        never a mix. The replaced version is kept for readers still opening
+        it; the one before it is removed.
+        """
+        dataset_dir = self._dataset_dir(name)
+        os.makedirs(dataset_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix="v-", dir=dataset_dir)
+        tmp_current = None
+        try:
+            columns = []
+            for i, column in enumerate(df.columns):
+                values = df[column].to_numpy()
+                if values.dtype == object:
+                    raise TypeError(f"Column {column} has object dtype; only numeric/datetime columns can be stored")
+                file_name = f"{i:04d}.npy"
+                np.save(os.path.join(tmp_dir, file_name), np.ascontiguousarray(values))
+                columns.append({"name": column, "file": file_name, "dtype": values.dtype.str})
+            with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+                json.dump({"rows": len(df), "columns": columns, "source": source}, f, indent=2)
+
+            previous = self._current(name)
+            fd, tmp_current = tempfile.mkstemp(prefix=f".{CURRENT_FILE}-", dir=dataset_dir)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": os.path.basename(tmp_dir), "previous": previous and previous["version"]}, f)
+            os.replace(tmp_current, os.path.join(dataset_dir, CURRENT_FILE))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if tmp_current is not None and os.path.exists(tmp_current):
+                os.remove(tmp_current)
+            raise
+
+        if previous and previous.get("previous"):
+            shutil.rmtree(os.path.join(dataset_dir, previous["previous"]), ignore_errors=True)
+        # Column files of the unversioned layout, where the dataset directory held them directly
+        for entry in os.listdir(dataset_dir):
+            if entry == META_FILE or entry.endswith(".npy"):
+                os.remove(os.path.join(dataset_dir, entry))
+
+    def load(self, name: str, columns: list = None) -> pd.DataFrame:
+        """
+        Opens a dataset without copying its columns into memory.
+
+        Args:
+            name: dataset name
+            columns: optional subset of columns to map, in the given order
+
+        Returns:
+            DataFrame whose columns are views of the memory-mapped files
+        """
+        def read(version_dir):
+            meta = _read_meta(version_dir)
+            by_name = {column["name"]: column for column in meta["columns"]}
+            wanted = columns if columns is not None else [column["name"] for column in meta["columns"]]
+            missing = [column for column in wanted if column not in by_name]
+            if missing:
+                raise KeyError(f"Columns not in store dataset {name}: {missing}")
+
+            data = {}
+            for column in wanted:
+                mapped = np.load(os.path.join(version_dir, by_name[column]["file"]), mmap_mode="c")
+                data[column] = mapped.view(np.ndarray)
+            return pd.DataFrame(data, columns=wanted, copy=False)
+
+        return self._read(name, read)
+
+    def import_parquet(self, path: str, name: str = None) -> str:
+        """Copies a parquet file into the store, skipping it if already up to date."""
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        stat = os.stat(path)
+        source = {"path": os.path.abspath(path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        if self.has(name) and self.meta(name).get("source") == source:
+            return name
+        self.write(name, pd.read_parquet(path), source=source)
+        print(f"Imported {path} into candle store as {name}")
+        return name
+
+    def import_cache(self, cache_dir: str = "candle_data") -> list:
+        """Imports every parquet file in the candle cache directory."""
+        names = []
+        for file_name in sorted(os.listdir(cache_dir)):
+            if file_name.endswith(".parquet") and not file_name.startswith("."):
+                names.append(self.import_parquet(os.path.join(cache_dir, file_name)))
+        return names
+
+
+def _read_meta(version_dir: str) -> dict:
+    with open(os.path.join(version_dir, META_FILE)) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    cache_dir = sys.argv[1] if len(sys.argv) > 1 else "candle_data"
+    store = CandleStore(sys.argv[2] if len(sys.argv) > 2 else STORE_DIR)
+    imported = store.import_cache(cache_dir)
+    print(f"Candle store at {store.root} holds: {', '.join(imported)}")
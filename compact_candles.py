@@ -0,0 +1,137 @@
+"""
+Compact in-memory representation for candle data.
+
+Candles come out of data_fetcher as float64 OHLCV plus a datetime64[ns]
+timestamp column repeated in every frame. CompactCandles stores each value
+column as float32 when the round trip stays within a relative tolerance
+(float64 otherwise) and replaces the timestamps with an int32 bar number
+counted from the Unix epoch, so frames on the same grid share one bar axis
+array. to_frame() materializes the usual timestamp + columns DataFrame, so
+strategies and the simulator consume it unchanged.
+"""
+import functools
+import numpy as np
+import pandas as pd
+
+# Maximum relative error a column may pick up from float32 storage
+COMPACT_RTOL = 1e-6
+
+
+@functools.lru_cache(maxsize=64)
+def _shared_bar_axis(first_bar: int, n_bars: int) -> np.ndarray:
+    bars = np.arange(first_bar, first_bar + n_bars, dtype=np.int32)
+    bars.flags.writeable = False
+    return bars
+
+
+def _infer_step_ns(timestamps: np.ndarray) -> int:
+    steps = np.diff(timestamps)
+    steps = steps[steps > 0]
+    if len(steps) == 0:
+        return 3600 * 10**9
+    return int(steps.min())
+
+
+class CompactCandles:
+    """
+    Columns stored as float32 where precision allows, on an int32 bar axis.
+
+    Attributes:
+        bars: int32 bar number of each row (timestamp = bars * step_ns since epoch)
+        step_ns: bar length in nanoseconds
+        data: {column: ndarray} of value columns
+        precision: {column: max relative error introduced by compaction}
+    """
+
+    def __init__(self, bars: np.ndarray, step_ns: int, data: dict, precision: dict = None):
+        self.bars = bars
+        self.step_ns = step_ns
+        self.data = data
+        self.precision = precision or {column: 0.0 for column in data}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, step_ns: int = None, rtol: float = COMPACT_RTOL) -> "CompactCandles":
+        """
+        Args:
+            df: DataFrame with a 'timestamp' column on an epoch-aligned bar grid
+            step_ns: bar length in nanoseconds; inferred from the timestamps if None
+            rtol: largest relative error accepted for a float32 column
+
+        Returns:
+            CompactCandles holding the same rows
+        """
+        timestamps = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        step_ns = step_ns or _infer_step_ns(timestamps)
+        if len(timestamps) and np.any(timestamps % step_ns):
+            raise ValueError(f"Timestamps are not on an epoch-aligned {pd.Timedelta(step_ns)} grid")
+        bar_numbers = timestamps // step_ns
+        if len(bar_numbers) and bar_numbers.max() > np.iinfo(np.int32).max:
+            raise ValueError("Bar numbers do not fit the int32 bar axis")
+
+        first_bar = int(bar_numbers[0]) if len(bar_numbers) else 0
+        if np.array_equal(bar_numbers, np.arange(first_bar, first_bar + len(bar_numbers))):
+            bars = _shared_bar_axis(first_bar, len(bar_numbers))
+        else:
+            bars = bar_numbers.astype(np.int32)
+
+        data, precision = {}, {}
+        for column in df.columns:
+            if column == 'timestamp':
+                continue
+            values = df[column].to_numpy()
+            if values.dtype.kind != 'f':
+                data[column], precision[column] = values, 0.0
+                continue
+            data[column], precision[column] = _compact_column(values, rtol)
+        return cls(bars, step_ns, data, precision)
+
+    def __len__(self) -> int:
+        return len(self.bars)
+
+    @property
+    def columns(self) -> list:
+        return ['timestamp'] + list(self.data)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return (self.bars.astype(np.int64) * self.step_ns).view('datetime64[ns]')
+
+    @property
+    def nbytes(self) -> int:
+        return self.bars.nbytes + sum(values.nbytes for values in self.data.values())
+
+    def to_frame(self, columns: list = None) -> pd.DataFrame:
+        """
+        Timestamp + value columns as a DataFrame, keeping the compact dtypes.
+
+        Args:
+            columns: optional subset of columns, in the given order
+        """
+        columns = columns or self.columns
+        missing = [column for column in columns if column != 'timestamp' and column not in self.data]
+        if missing:
+            raise KeyError(f"Columns not in compact candles: {missing}")
+        frame = {column: self.timestamps if column == 'timestamp' else self.data[column] for column in columns}
+        return pd.DataFrame(frame, columns=columns)
+
+
+def _compact_column(values: np.ndarray, rtol: float):
+    """float32 copy of values if every finite value round-trips within rtol, else values"""
+    with np.errstate(over='ignore', invalid='ignore'):
+        narrow = values.astype(np.float32)
+        widened = narrow.astype(values.dtype)
+        finite = np.isfinite(values)
+        if not np.array_equal(np.isfinite(widened), finite):
+            return values, 0.0
+        scale = np.abs(values[finite])
+        error = np.abs(widened[finite] - values[finite])
+        relative = np.divide(error, scale, out=np.zeros_like(error), where=scale > 0)
+    max_error = float(relative.max()) if len(relative) else 0.0
+    if max_error > rtol:
+        return values, 0.0
+    return narrow, max_error
+
+
+def compact_frame(df: pd.DataFrame, rtol: float = COMPACT_RTOL) -> pd.DataFrame:
+    """Same frame with value columns narrowed to float32 where precision allows"""
+    return CompactCandles.from_frame(df, rtol=rtol).to_frame()
@@ -360,9 +360,14 @@ if st.session_state.evaluation_results:
                 st.markdown("#### 📈 Trade History")
                 tradelog_df = pd.DataFrame(strategy_result['tradelog'])
                 
-                # Plot capital over time with modern styling
+                # Plot capital over time with modern styling, per bar when available
+                if 'equity_curve' in strategy_result:
+                    equity_curve = strategy_result['equity_curve']
+                    chart_data = pd.Series(equity_curve['equity'], index=equity_curve['timestamp'], name='equity')
+                else:
+                    chart_data = tradelog_df.set_index('timestamp')['capital']
                 st.line_chart(
-                    tradelog_df.set_index('timestamp')['capital'],
+                    chart_data,
                     use_container_width=True
                 )
                 
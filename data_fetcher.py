@@ -1,30 +1,375 @@
 import os
+import time
+import tempfile
+import threading
+import re
+import functools
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 
-def create_standard_time_grid():
-    """Create standard 1H time grid with exactly 3073 rows"""
-    start_date = datetime(2025, 1, 1)
-    end_date = datetime(2025, 5, 9)
+CACHE_DIR = "candle_data"
+
+# Panel of every anchor coin's candles, with open/high/low/close/volume_{SYMBOL}_{TF} columns
+ANCHOR_FILE = os.path.join(CACHE_DIR, "candles_anchor_all.parquet")
+ANCHOR_FIELDS = ["open", "high", "low", "close", "volume"]
+
+# Klines endpoint; point KLINES_URL at klines_stub.py to work offline
+KLINES_URL = os.getenv("KLINES_URL", "https://api.binance.com/api/v3/klines")
+
+INTERVAL_MS = {
+    '1h': 60 * 60 * 1000,
+    '4h': 4 * 60 * 60 * 1000,
+    '1d': 24 * 60 * 60 * 1000,
+}
+
+# Request weight of one klines call and the default per-minute allowance
+KLINES_REQUEST_WEIGHT = 2
+DEFAULT_WEIGHT_PER_MINUTE = 1200
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session(pool_size: int = 16) -> requests.Session:
+    """Shared keep-alive session reused by every klines request"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+class RequestWeightBudget:
+    """
+    Thread-safe sliding-window limiter on request weight
+    
+    acquire() blocks until spending the given weight keeps the total
+    within weight_per_window over the last window_seconds.
+    """
+    
+    def __init__(self, weight_per_window: int = DEFAULT_WEIGHT_PER_MINUTE, window_seconds: float = 60.0):
+        self.weight_per_window = weight_per_window
+        self.window_seconds = window_seconds
+        self._spent = []  # (monotonic time, weight)
+        self._lock = threading.Lock()
+    
+    def acquire(self, weight: int = KLINES_REQUEST_WEIGHT):
+        if weight > self.weight_per_window:
+            raise ValueError(f"Request weight {weight} exceeds the budget of {self.weight_per_window}")
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._spent = [(t, w) for t, w in self._spent if now - t < self.window_seconds]
+                used = sum(w for _, w in self._spent)
+                if used + weight <= self.weight_per_window:
+                    self._spent.append((now, weight))
+                    return
+                # Wait until enough of the oldest weight leaves the window
+                freed, wait = 0, self.window_seconds
+                for t, w in self._spent:
+                    freed += w
+                    if used - freed + weight <= self.weight_per_window:
+                        wait = self.window_seconds - (now - t)
+                        break
+            time.sleep(max(wait, 0.01))
+
+def _atomic_to_parquet(df: pd.DataFrame, path: str):
+    """Write parquet to a temp file and rename it over path, so readers never see a partial file"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".parquet", dir=directory)
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+BASE_TIMEFRAME = '1h'
+
+# Default backtest range; change it with configure_time_grid()
+_grid_range = {'start': datetime(2025, 1, 1), 'end': datetime(2025, 5, 9)}
+
+# Candles derived from the 1h cache: (symbol, hours, grid range) -> (cache mtime, frame),
+# least recently used first; a refreshed cache replaces its entry instead of adding one
+_derived_candles = OrderedDict()
+_derived_lock = threading.Lock()
+DERIVED_CACHE_SIZE = 32
+
+def timeframe_hours(timeframe: str) -> int:
+    """Number of hours in a timeframe like '1h', '4h', '12H' or '1d'"""
+    match = re.fullmatch(r'(\d+)([hd])', timeframe.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Unsupported timeframe: {timeframe}. Use N hours ('4h') or N days ('1d')")
+    count, unit = int(match.group(1)), match.group(2)
+    return count * 24 if unit == 'd' else count
+
+class TimeGrid:
+    """
+    Regular grid of bar open times between start and end (inclusive)
+    
+    Bars start on multiples of the bar length since the Unix epoch, so the
+    grid position of any timestamp is plain integer arithmetic. align()
+    uses that to place rows directly instead of hash-merging on timestamp.
+    """
+    
+    def __init__(self, start, end, timeframe: str = BASE_TIMEFRAME):
+        self.timeframe = timeframe
+        self.step_ns = timeframe_hours(timeframe) * 3600 * 10**9
+        start_ns = pd.Timestamp(start).value
+        end_ns = pd.Timestamp(end).value
+        self.start_ns = start_ns // self.step_ns * self.step_ns
+        n_bars = max((end_ns - self.start_ns) // self.step_ns + 1, 0)
+        
+        self.timestamps = (self.start_ns + np.arange(n_bars, dtype=np.int64) * self.step_ns).view('datetime64[ns]')
+        self.timestamps.flags.writeable = False
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    def frame(self) -> pd.DataFrame:
+        """The grid as a DataFrame with a single 'timestamp' column"""
+        return pd.DataFrame({'timestamp': self.timestamps})
+    
+    def positions(self, timestamps) -> np.ndarray:
+        """Grid row of each timestamp, or -1 when it is off the grid"""
+        values = np.asarray(timestamps, dtype='datetime64[ns]').view(np.int64)
+        offsets = values - self.start_ns
+        positions = offsets // self.step_ns
+        on_grid = (offsets >= 0) & (offsets % self.step_ns == 0) & (positions < len(self))
+        return np.where(on_grid, positions, -1)
+    
+    def align(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Place the rows of df at their grid positions, like a left merge of the
+        grid with df on 'timestamp'; rows off the grid are dropped and grid
+        rows without data are NaN
+        """
+        positions = self.positions(df['timestamp'].to_numpy())
+        on_grid = positions >= 0
+        rows = positions[on_grid]
+        
+        aligned = {'timestamp': self.timestamps.copy()}
+        for column in df.columns:
+            if column == 'timestamp':
+                continue
+            values = df[column].to_numpy()[on_grid]
+            if values.dtype.kind in 'fiu':
+                filled = np.full(len(self), np.nan, dtype=np.result_type(values.dtype, np.float32))
+            elif values.dtype.kind == 'M':
+                filled = np.full(len(self), np.datetime64('NaT'), dtype=values.dtype)
+            else:
+                filled = np.full(len(self), np.nan, dtype=object)
+            filled[rows] = values
+            aligned[column] = filled
+        return pd.DataFrame(aligned)
+
+@functools.lru_cache(maxsize=32)
+def _cached_time_grid(timeframe_hours_: int, start_ns: int, end_ns: int) -> TimeGrid:
+    return TimeGrid(pd.Timestamp(start_ns), pd.Timestamp(end_ns), f'{timeframe_hours_}h')
+
+def get_time_grid(timeframe: str = BASE_TIMEFRAME, start=None, end=None) -> TimeGrid:
+    """
+    Cached TimeGrid for the timeframe, over the configured range unless
+    start/end are given
+    """
+    start = pd.Timestamp(start if start is not None else _grid_range['start'])
+    end = pd.Timestamp(end if end is not None else _grid_range['end'])
+    return _cached_time_grid(timeframe_hours(timeframe), start.value, end.value)
+
+def configure_time_grid(start=None, end=None):
+    """
+    Change the default backtest range used by every loader (e.g. to run
+    multi-year histories); bars stay epoch-aligned
+    """
+    if start is not None:
+        _grid_range['start'] = pd.Timestamp(start).to_pydatetime()
+    if end is not None:
+        _grid_range['end'] = pd.Timestamp(end).to_pydatetime()
+
+def create_standard_time_grid(timeframe: str = BASE_TIMEFRAME):
+    """Create standard time grid (exactly 3073 rows for 1H over the default range)"""
+    return get_time_grid(timeframe).frame()
+
+def resample_candles(candles: pd.DataFrame, timeframe: str, include_partial: bool = False) -> pd.DataFrame:
+    """
+    Aggregate 1h OHLCV candles into coarser bars with vectorized reductions
+    
+    Bars are aligned to multiples of the bar length since the Unix epoch, like
+    exchange candles, and labelled by their open time. Missing hours are
+    skipped; a bar with no candles at all is left out. The newest bar is
+    still forming when the 1h data stops before its last hour; it is left out
+    too, so its close is not mistaken for the finished bar's.
+    
+    Args:
+        candles: DataFrame with timestamp + OHLCV at 1h resolution
+        timeframe: target timeframe, e.g. '4h', '1d' or '6h'
+        include_partial: keep that still-forming newest bar
+    
+    Returns:
+        DataFrame (timestamp + OHLCV) with one row per non-empty bar
+    """
+    bar_ns = timeframe_hours(timeframe) * 3600 * 10**9
+    df = candles.dropna(subset=['close']).sort_values('timestamp')
+    if df.empty:
+        return pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    timestamps = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    
+    bar_ids = timestamps // bar_ns
+    starts = np.flatnonzero(np.diff(bar_ids, prepend=bar_ids[0] - 1))
+    ends = np.append(starts[1:], len(bar_ids)) - 1
+    
+    bars = pd.DataFrame({
+        'timestamp': (bar_ids[starts] * bar_ns).view('datetime64[ns]'),
+        'open': df['open'].to_numpy()[starts],
+        'high': np.fmax.reduceat(df['high'].to_numpy(), starts),
+        'low': np.fmin.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+        'volume': np.add.reduceat(np.nan_to_num(df['volume'].to_numpy()), starts),
+    })
+    last_hour_ns = (bar_ids[-1] + 1) * bar_ns - timeframe_hours(BASE_TIMEFRAME) * 3600 * 10**9
+    if not include_partial and timestamps[-1] < last_hour_ns:
+        bars = bars.iloc[:-1]
+    return bars
+
+def derive_target_data(symbol: str, timeframe: str) -> pd.DataFrame:
+    """
+    Build coarser candles for symbol from its cached 1h data, aligned to the
+    grid of the requested timeframe
+    
+    Results are memoized in-process until the 1h cache file changes, so
+    multi-timeframe strategies trigger no extra requests or cache files. Only
+    the newest frame per symbol, timeframe and grid is kept, and at most
+    DERIVED_CACHE_SIZE frames in all.
+    """
+    grid = get_time_grid(timeframe)
+    base_file = _cache_path(symbol, BASE_TIMEFRAME)
+    if not os.path.exists(base_file):
+        fetch_target_data(symbol, BASE_TIMEFRAME)
+    if not os.path.exists(base_file):
+        return grid.frame()
+    
+    key = (symbol.lower(), grid.step_ns, grid.start_ns, len(grid))
+    mtime_ns = os.stat(base_file).st_mtime_ns
+    with _derived_lock:
+        entry = _derived_candles.get(key)
+    if entry is None or entry[0] != mtime_ns:
+        bars = resample_candles(pd.read_parquet(base_file), timeframe)
+        entry = (mtime_ns, grid.align(bars))
+        print(f"Derived {len(grid)} {timeframe} rows for {symbol} from 1h data")
+    with _derived_lock:
+        _derived_candles[key] = entry
+        _derived_candles.move_to_end(key)
+        while len(_derived_candles) > DERIVED_CACHE_SIZE:
+            _derived_candles.popitem(last=False)
+    return entry[1].copy()
+
+def _cache_path(symbol: str, timeframe: str) -> str:
+    return os.path.join(CACHE_DIR, f"{symbol.lower()}_{timeframe}.parquet")
+
+def _fetch_klines(symbol: str, timeframe: str, start_time: int, end_time: int,
+                  budget: RequestWeightBudget = None) -> pd.DataFrame:
+    """
+    Page through the klines endpoint between two millisecond timestamps,
+    over the shared session and within the request-weight budget if given
+    
+    Returns:
+        DataFrame (timestamp + OHLCV) sorted and without duplicate timestamps,
+        empty if the endpoint returned nothing
+    """
+    all_data = []
+    current_start = start_time
+    
+    while current_start < end_time:
+        params = {
+            'symbol': f"{symbol}USDT",
+            'interval': timeframe,
+            'startTime': current_start,
+            'endTime': end_time,
+            'limit': 1000
+        }
+        
+        if budget is not None:
+            budget.acquire(KLINES_REQUEST_WEIGHT)
+        response = get_session().get(KLINES_URL, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data:
+            break
+            
+        # Convert to DataFrame
+        df_batch = pd.DataFrame(data, columns=[
+            'timestamp', 'open', 'high', 'low', 'close', 'volume',
+            'close_time', 'quote_volume', 'trades', 'taker_buy_base',
+            'taker_buy_quote', 'ignore'
+        ])
+        
+        # Keep only essential columns
+        df_batch = df_batch[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+        
+        # Convert types
+        df_batch['timestamp'] = pd.to_datetime(df_batch['timestamp'], unit='ms')
+        for col in ['open', 'high', 'low', 'close', 'volume']:
+            df_batch[col] = pd.to_numeric(df_batch[col])
+        
+        all_data.append(df_batch)
+        
+        # 🔥 FIXED PAGINATION: Use raw timestamp from API + interval
+        # OLD: current_start = int((df_batch['timestamp'].max() + pd.Timedelta(hours=1)).timestamp() * 1000)
+        last_timestamp_ms = data[-1][0]  # Raw timestamp from API response
+        current_start = last_timestamp_ms + INTERVAL_MS[timeframe]
+        
+        print(f"Fetched batch: {len(df_batch)} records, total batches: {len(all_data)}")
+        
+        # Break if we got less than 1000 records (last page)
+        if len(data) < 1000:
+            break
+    
+    if not all_data:
+        return pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    
+    # Combine all batches
+    df = pd.concat(all_data, ignore_index=True)
     
-    # Create 1H intervals
-    time_grid = pd.date_range(start=start_date, end=end_date, freq='1H')
-    return pd.DataFrame({'timestamp': time_grid})
+    # 🔥 ADDED: Remove duplicates that may occur at batch boundaries
+    return df.drop_duplicates(subset=['timestamp']).sort_values('timestamp').reset_index(drop=True)
 
-def fetch_target_data(symbol: str, timeframe: str = "1h") -> pd.DataFrame:
+def fetch_target_data(symbol: str, timeframe: str = "1h", incremental: bool = False,
+                      budget: RequestWeightBudget = None) -> pd.DataFrame:
     """
     Fetch target data with pagination and ensure exactly 3073 rows
     
     Args:
         symbol: coin symbol like 'BTC', 'ETH' 
-        timeframe: '1h', '4h', or '1d'
+        timeframe: '1h', or any coarser '4h', '1d', 'Nh' (derived from the 1h cache)
+        incremental: extend an existing cache with the newest candles
+            (see refresh_target_data) before loading it
+        budget: optional RequestWeightBudget shared with other fetches
     
     Returns:
-        DataFrame with exactly 3073 rows (timestamp + OHLCV)
+        DataFrame with exactly 3073 rows for 1h (timestamp + OHLCV), or one row
+        per bar of the coarser timeframe's grid
     """
     
-    cache_file = f"candle_data/{symbol.lower()}_{timeframe}.parquet"
+    if timeframe_hours(timeframe) != 1:
+        if incremental:
+            refresh_target_data(symbol, BASE_TIMEFRAME, budget=budget)
+        return derive_target_data(symbol, timeframe)
+    
+    cache_file = _cache_path(symbol, timeframe)
+    
+    if incremental and os.path.exists(cache_file):
+        refresh_target_data(symbol, timeframe, budget=budget)
     
     # Check if cached file exists
     if os.path.exists(cache_file):
@@ -32,92 +377,31 @@ def fetch_target_data(symbol: str, timeframe: str = "1h") -> pd.DataFrame:
         df = pd.read_parquet(cache_file)
         
         # Still align to standard grid even if cached
-        standard_grid = create_standard_time_grid()
-        result = pd.merge(standard_grid, df, on='timestamp', how='left')
+        result = get_time_grid().align(df)
         print(f"Loaded {len(result)} rows for {symbol} (aligned to standard grid)")
         return result
     
     # If no cache, fetch from Binance with pagination
     print(f"Fetching fresh data for {symbol} {timeframe} with pagination...")
     
-    start_time = int(datetime(2025, 1, 1).timestamp() * 1000)
-    end_time = int((datetime(2025, 5, 9, 23, 59)).timestamp() * 1000)
-    
-    all_data = []
-    current_start = start_time
+    grid = get_time_grid()
+    start_time = grid.start_ns // 10**6
+    end_time = (grid.start_ns + len(grid) * grid.step_ns) // 10**6 - 1
     
     try:
-        while current_start < end_time:
-            url = "https://api.binance.com/api/v3/klines"
-            params = {
-                'symbol': f"{symbol}USDT",
-                'interval': timeframe,
-                'startTime': current_start,
-                'endTime': end_time,
-                'limit': 1000
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if not data:
-                break
-                
-            # Convert to DataFrame
-            df_batch = pd.DataFrame(data, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-                'taker_buy_quote', 'ignore'
-            ])
-            
-            # Keep only essential columns
-            df_batch = df_batch[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-            
-            # Convert types
-            df_batch['timestamp'] = pd.to_datetime(df_batch['timestamp'], unit='ms')
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                df_batch[col] = pd.to_numeric(df_batch[col])
-            
-            all_data.append(df_batch)
-            
-            # 🔥 FIXED PAGINATION: Use raw timestamp from API + interval
-            # OLD: current_start = int((df_batch['timestamp'].max() + pd.Timedelta(hours=1)).timestamp() * 1000)
-            if len(data) > 0:
-                last_timestamp_ms = data[-1][0]  # Raw timestamp from API response
-                if timeframe == '1h':
-                    current_start = last_timestamp_ms + (60 * 60 * 1000)
-                elif timeframe == '4h':
-                    current_start = last_timestamp_ms + (4 * 60 * 60 * 1000)
-                elif timeframe == '1d':
-                    current_start = last_timestamp_ms + (24 * 60 * 60 * 1000)
-            
-            print(f"Fetched batch: {len(df_batch)} records, total batches: {len(all_data)}")
-            
-            # Break if we got less than 1000 records (last page)
-            if len(data) < 1000:
-                break
+        df = _fetch_klines(symbol, timeframe, start_time, end_time, budget)
         
-        if not all_data:
+        if df.empty:
             print(f"No data fetched for {symbol}")
             return create_standard_time_grid()
         
-        # Combine all batches
-        df = pd.concat(all_data, ignore_index=True)
-        
-        # 🔥 ADDED: Remove duplicates that may occur at batch boundaries
-        df = df.drop_duplicates(subset=['timestamp']).sort_values('timestamp').reset_index(drop=True)
-        
         print(f"Total fetched records: {len(df)}")
         
-        # Create standard time grid (3073 rows)
-        standard_grid = create_standard_time_grid()
-        
-        # Align fetched data to standard grid
-        aligned_df = pd.merge(standard_grid, df, on='timestamp', how='left')
+        # Align fetched data to standard grid (3073 rows)
+        aligned_df = grid.align(df)
         
         # Save to cache
-        aligned_df.to_parquet(cache_file, index=False)
+        _atomic_to_parquet(aligned_df, cache_file)
         print(f"✅ SAVED {len(aligned_df)} rows to cache: {cache_file}")
         
         return aligned_df
@@ -125,4 +409,94 @@ def fetch_target_data(symbol: str, timeframe: str = "1h") -> pd.DataFrame:
     except Exception as e:
         print(f"Error fetching data for {symbol}: {e}")
         # Return empty grid with 3073 rows
-        return create_standard_time_grid()
\ No newline at end of file
+        return create_standard_time_grid()
+
+def refresh_target_data(symbol: str, timeframe: str = "1h", end_time: int = None,
+                        budget: RequestWeightBudget = None) -> pd.DataFrame:
+    """
+    Extend a cached candle file with only the candles after its last cached one
+    
+    Only closed candles are appended: the next refresh starts after the last
+    cached candle, so a still-forming one would never be corrected.
+    
+    Args:
+        symbol: coin symbol like 'BTC', 'ETH'
+        timeframe: '1h', '4h', or '1d'
+        end_time: last candle open time to fetch, in ms (defaults to the last
+            closed candle)
+        budget: optional RequestWeightBudget shared with other fetches
+    
+    Returns:
+        The full cache contents after appending (timestamp + OHLCV)
+    """
+    cache_file = _cache_path(symbol, timeframe)
+    if not os.path.exists(cache_file):
+        print(f"No cache for {symbol} {timeframe}, doing a full fetch")
+        return fetch_target_data(symbol, timeframe, budget=budget)
+    
+    cached = pd.read_parquet(cache_file)
+    filled = cached.dropna(subset=['close'])
+    if filled.empty:
+        print(f"Cache for {symbol} {timeframe} has no candles, doing a full fetch")
+        os.remove(cache_file)
+        return fetch_target_data(symbol, timeframe, budget=budget)
+    
+    interval_ms = INTERVAL_MS[timeframe]
+    now_ms = pd.Timestamp.now(tz='UTC').value // 10**6
+    last_cached_ms = filled['timestamp'].max().value // 10**6
+    start_time = last_cached_ms + interval_ms
+    if end_time is None:
+        # Just before the open of the current, still-forming candle
+        end_time = now_ms // interval_ms * interval_ms - 1
+    if start_time > end_time:
+        print(f"Cache for {symbol} {timeframe} is up to date")
+        return cached
+    
+    print(f"Refreshing {symbol} {timeframe} from {pd.to_datetime(start_time, unit='ms')}...")
+    try:
+        new_rows = _fetch_klines(symbol, timeframe, start_time, end_time, budget)
+    except Exception as e:
+        print(f"Error refreshing data for {symbol}: {e}")
+        return cached
+    
+    # An explicit end_time may reach into a candle that has not closed yet
+    new_rows = new_rows[new_rows['timestamp'] + pd.Timedelta(milliseconds=interval_ms) <= pd.Timestamp(now_ms, unit='ms')]
+    if new_rows.empty:
+        print(f"No new candles for {symbol} {timeframe}")
+        return cached
+    
+    # New candles replace any empty grid rows already holding their timestamps
+    combined = pd.concat([cached, new_rows], ignore_index=True)
+    combined = combined.drop_duplicates(subset=['timestamp'], keep='last').sort_values('timestamp').reset_index(drop=True)
+    _atomic_to_parquet(combined, cache_file)
+    print(f"✅ APPENDED {len(new_rows)} candles to cache: {cache_file}")
+    return combined
+
+def fetch_many(pairs: list, max_workers: int = 4, weight_per_minute: int = DEFAULT_WEIGHT_PER_MINUTE,
+               incremental: bool = False) -> dict:
+    """
+    Fetch (or load from cache) several symbols concurrently
+    
+    Args:
+        pairs: list of (symbol, timeframe) tuples, e.g. [('LDO', '1h'), ('BTC', '4h')]
+        max_workers: number of pairs paged at the same time
+        weight_per_minute: request-weight allowance shared by all workers
+        incremental: refresh existing caches with their newest candles
+    
+    Returns:
+        dict mapping (symbol, timeframe) to the aligned DataFrame
+    """
+    budget = RequestWeightBudget(weight_per_minute)
+    get_session(pool_size=max(max_workers, 1))
+    results = {}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_target_data, symbol, timeframe, incremental, budget): (symbol, timeframe)
+            for symbol, timeframe in dict.fromkeys(pairs)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    
+    print(f"Fetched {len(results)} symbol/timeframe pairs")
+    return results
@@ -1,12 +1,108 @@
 import os
+import re
 import sys
 import pandas as pd
-import numpy as np
-import importlib.util
-from data_fetcher import fetch_target_data
+from data_fetcher import ANCHOR_FIELDS, ANCHOR_FILE, BASE_TIMEFRAME, _cache_path, fetch_target_data, get_time_grid
 from simulator import TradeSimulator
+from compact_candles import compact_frame
+from metrics import compute_metrics
+from bootstrap import bootstrap_metrics, confidence_intervals
+from stage_cache import StageCache, file_fingerprint
+from strategy_registry import StrategyRegistry
+from profiling import StageTimer
+from anchor_access import UndeclaredAnchorError, track_anchor_access, tracked_anchors
 
-def run_strategy_evaluation(strategy_name: str) -> dict:
+ANCHOR_COLUMN_PATTERN = re.compile(r"\b(?:open|high|low|close|volume)_[A-Za-z0-9]+_\d+[A-Za-z]\b")
+# Bump when a pipeline stage changes what it produces, to retire old stage cache entries
+STAGE_CACHE_VERSION = 2
+
+# Loaded strategy modules, reused until their file changes
+STRATEGY_REGISTRY = StrategyRegistry()
+
+def anchor_columns(metadata: dict) -> list:
+    """
+    Columns of candles_anchor_all.parquet a strategy declares in get_coin_metadata()
+    
+    Returns:
+        ['timestamp'] followed by open/high/low/close/volume_{SYMBOL}_{TF} for each anchor
+    """
+    columns = ["timestamp"]
+    for anchor in metadata.get("anchors", []):
+        symbol = anchor["symbol"].upper()
+        timeframe = anchor.get("timeframe", "1H").upper()
+        columns += [f"{field}_{symbol}_{timeframe}" for field in ANCHOR_FIELDS]
+    return list(dict.fromkeys(columns))
+
+def load_anchor_candles(metadata: dict = None, anchor_file: str = ANCHOR_FILE, compact: bool = False) -> pd.DataFrame:
+    """
+    Read the anchor columns declared in metadata, or every column when metadata is None;
+    with compact=True price/volume columns are narrowed to float32 where precision allows
+    """
+    columns = anchor_columns(metadata) if metadata is not None else None
+    candles_anchor = FileCandleSource(anchor_file).anchor_candles(columns)
+    return compact_frame(candles_anchor) if compact else candles_anchor
+
+class FileCandleSource:
+    """
+    Where run_strategy_evaluation gets candles by default: the anchor panel
+    parquet file and data_fetcher's per-symbol caches. Any object with the
+    same two methods can be passed as candle_source instead (see batch_runner).
+    """
+    
+    def __init__(self, anchor_file: str = ANCHOR_FILE):
+        self.anchor_file = anchor_file
+    
+    def anchor_candles(self, columns: list = None) -> pd.DataFrame:
+        """Anchor panel columns (every column when columns is None)"""
+        return pd.read_parquet(self.anchor_file, columns=columns)
+    
+    def target_candles(self, symbol: str, timeframe: str) -> pd.DataFrame:
+        return fetch_target_data(symbol, timeframe)
+    
+    def fingerprint(self, symbol: str, timeframe: str) -> dict:
+        """Identifies the candles the two loaders return, for stage cache keys"""
+        grid = get_time_grid(timeframe)
+        return {
+            "anchor": file_fingerprint(self.anchor_file),
+            "target": file_fingerprint(_cache_path(symbol, BASE_TIMEFRAME)),
+            "grid": [int(grid.start_ns), len(grid)],
+        }
+
+def strategy_path(strategy_name: str) -> str:
+    return f"Strategies/{strategy_name}.py"
+
+def load_strategy_module(strategy_name: str):
+    """
+    Import Strategies/{strategy_name}.py through the strategy registry, which
+    re-executes the file only when it changed; raises FileNotFoundError if it
+    does not exist
+    """
+    path = strategy_path(strategy_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Strategy file not found: {path}")
+    return STRATEGY_REGISTRY.load(path)
+
+def _undeclared_anchor_columns(error: Exception, declared: list) -> list:
+    """Anchor column names mentioned in a KeyError that the strategy did not declare"""
+    mentioned = ANCHOR_COLUMN_PATTERN.findall(str(error))
+    return sorted(set(mentioned) - set(declared))
+
+def _cached_stage(cache, stage: str, parts: dict, compute, span: dict = None):
+    """Run a pipeline stage through the stage cache, or directly when cache is None"""
+    if cache is None:
+        return compute()
+    hits = cache.hits
+    value, _ = cache.memo(stage, parts, compute)
+    if cache.hits > hits:
+        print(f"Using cached {stage} stage")
+        if span is not None:
+            span["cached"] = True
+    return value
+
+def run_strategy_evaluation(strategy_name: str, strict_anchors: bool = False, compact: bool = False,
+                            candle_source=None, initial_capital: float = 1000.0, fee_pct: float = 0.001,
+                            cache: StageCache = None, bootstrap_paths: int = 0, profile_stage: str = None,
+                            trace_memory: bool = False, memory_budget_mb: float = None) -> dict:
     """
     Simple evaluation function that matches your actual setup:
     1. Loads strategy from strategies folder
@@ -15,43 +111,61 @@ def run_strategy_evaluation(strategy_name: str) -> dict:
     4. Fetches target data using simple_data_fetcher
     5. Runs generate_signals() with proper parameters
     6. Simulates trades using TradeSimulator
+    7. Calculates performance metrics
     
     Args:
         strategy_name: name of the strategy file (without .py extension)
+        strict_anchors: fail when the strategy reads an anchor column it did not
+            declare in get_coin_metadata(), instead of falling back to loading
+            every anchor column
+        compact: hold candle columns as float32 where the per-column precision
+            check allows (see compact_candles), roughly halving candle memory
+        candle_source: object with anchor_candles(columns) and
+            target_candles(symbol, timeframe); defaults to FileCandleSource
+        initial_capital, fee_pct: TradeSimulator settings
+        cache: optional StageCache; steps 3-7 are then memoized on disk, keyed by
+            the strategy source, the candle_source fingerprint and the settings
+            each step depends on
+        bootstrap_paths: when > 0, resample the tradelog's PnL this many times
+            (see bootstrap) and add 5/50/95% quantiles of return, drawdown and
+            Sharpe ratio as 'confidence_intervals'
+        profile_stage: run this stage ("load", "load/anchor_read",
+            "load/target_fetch", "signals", "simulate" or "metrics") under
+            cProfile and write its .prof and folded-stacks files to profiles/
+        trace_memory: also record per stage the peak bytes allocated (tracemalloc),
+            the top allocation sites and the peak RSS; slows the run down
+        memory_budget_mb: fail the evaluation at the next stage boundary once
+            process RSS has grown by more than this many MB since it started
+            (worker pools also cap their address space; see batch_runner)
     
     Returns:
-        dict with basic results and trading performance metrics
+        dict with basic results and trading performance metrics; 'stage_timings'
+        lists wall time, CPU time, row count (and memory use) per stage
     """
+    memory_budget = int(memory_budget_mb * 2**20) if memory_budget_mb is not None else None
+    timer = StageTimer(profile_stage, label=strategy_name, trace_memory=trace_memory, memory_budget=memory_budget)
     
     try:
         # Step 1: Load strategy from strategies folder
         print(f"Loading strategy: {strategy_name}")
         
-        strategy_path = f"Strategies/{strategy_name}.py"
-        if not os.path.exists(strategy_path):
-            return {"error": f"Strategy file not found: {strategy_path}"}
-        
-        # Import the strategy module
-        spec = importlib.util.spec_from_file_location("strategy", strategy_path)
-        strategy_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(strategy_module)
+        try:
+            strategy_module = load_strategy_module(strategy_name)
+        except FileNotFoundError as e:
+            return {"error": str(e)}
         
         # Step 2: Get metadata using get_coin_metadata (not get_metadata)
         print("Getting strategy metadata...")
         metadata = strategy_module.get_coin_metadata()
         print(f"Metadata: {metadata}")
         
-        # Step 3: Load anchor data from parquet file
-        print("Loading anchor data from candles_anchor_all.parquet...")
-        anchor_file = "candle_data/candles_anchor_all.parquet"
-        if not os.path.exists(anchor_file):
-            return {"error": f"Anchor data file not found: {anchor_file}"}
-        
-        candles_anchor = pd.read_parquet(anchor_file)
-        print(f"Loaded {len(candles_anchor)} rows of anchor data")
+        if candle_source is None:
+            anchor_file = ANCHOR_FILE
+            if not os.path.exists(anchor_file):
+                return {"error": f"Anchor data file not found: {anchor_file}"}
+            candle_source = FileCandleSource(anchor_file)
         
-        # Step 4: Get target data using simple_data_fetcher
-        print("Fetching target data...")
+        declared_columns = anchor_columns(metadata)
         target = metadata.get("target", {})
         target_symbol = target.get("symbol")
         target_timeframe = target.get("timeframe", "1h").lower()
@@ -59,151 +173,176 @@ def run_strategy_evaluation(strategy_name: str) -> dict:
         if not target_symbol:
             return {"error": "No target symbol in metadata"}
         
-        candles_target = fetch_target_data(target_symbol, target_timeframe)
-        print(f"Loaded {len(candles_target)} rows of target data for {target_symbol}")
+        if cache is not None and not hasattr(candle_source, "fingerprint"):
+            print("Warning: candle source has no fingerprint(); stage cache disabled")
+            cache = None
+        data_fingerprint = candle_source.fingerprint(target_symbol, target_timeframe) if cache is not None else None
+        if cache is not None and any(isinstance(part, dict) and part.get("missing") for part in data_fingerprint.values()):
+            # The fetch may fail and return an empty grid; it must not be stored under this key
+            print("Candle cache file not written yet; stage cache disabled for this run")
+            cache = None
+        if cache is not None:
+            load_parts = {
+                "version": STAGE_CACHE_VERSION,
+                "data": data_fingerprint,
+                "anchor_columns": declared_columns,
+                "target": [target_symbol, target_timeframe],
+                "compact": compact,
+            }
+            signals_parts = {
+                "load": cache.key("load", load_parts),
+                "strategy": STRATEGY_REGISTRY.digest(strategy_path(strategy_name)),
+                "strict_anchors": strict_anchors,
+            }
+            simulate_parts = {
+                "signals": cache.key("signals", signals_parts),
+                "initial_capital": initial_capital,
+                "fee_pct": fee_pct,
+            }
+            metrics_parts = {"simulate": cache.key("simulate", simulate_parts)}
+        else:
+            load_parts = signals_parts = simulate_parts = metrics_parts = None
         
-        # Step 5: Run generate_signals with proper parameters (candles_target, candles_anchor)
-        print("Generating signals...")
-        signals_df = strategy_module.generate_signals(candles_target, candles_anchor)
-        print(f"Generated {len(signals_df)} signal rows")
-
-        # Step 6: Simulate trades using TradeSimulator
-        print("Simulating trades...")
-        simulator = TradeSimulator(initial_capital=1000.0, fee_pct=0.001)
-        tradelog = simulator.run(candles_target, signals_df)
-        print(f"Trade log columns: {tradelog.columns.tolist()}")
-        print(f"First few trades:\n{tradelog.head()}")
-        print(f"Total trades: {len(tradelog)}")
-
-        # Step 7: Calculate Profit Results
-        initial_capital = 1000.0
-        final_capital = tradelog["capital"].iloc[-1] if not tradelog.empty else initial_capital
-        print(f"Final capital: {final_capital}")
-
-        total_return = (final_capital - initial_capital) / initial_capital
-        return_percentage = total_return * 100
-        print(f"Total return: {return_percentage:.2f}%")
-
-        # Step 8: Calculate Maximum Drawdown
-        peak_capital = tradelog["capital"].cummax()
-        drawdown_series = tradelog["capital"] / peak_capital - 1
-        max_drawdown = drawdown_series.min()
-        max_drawdown_percentage = abs(max_drawdown * 100)
-        print(f"Max drawdown: {max_drawdown_percentage:.2f}%")
-
-        # Step 9: Calculate Sharpe Ratio
-        daily_returns = tradelog["PnL"].values
-        avg_return = np.mean(daily_returns)
-        return_std = np.std(daily_returns)
-        risk_free_rate = 0.0
-
-        sharpe_ratio = 0.0
-        if return_std > 0:
-            sharpe_ratio = (avg_return - risk_free_rate) / return_std
-        print(f"Sharpe ratio: {sharpe_ratio:.2f}")
-
-        # Calculate additional metrics
-        winning_trades = tradelog[tradelog['PnL'] > 0]
-        losing_trades = tradelog[tradelog['PnL'] < 0]
+        def load_candles():
+            # Step 3: Load the declared anchor columns from parquet file
+            print("Loading anchor data from candles_anchor_all.parquet...")
+            with timer.span("anchor_read") as span:
+                candles_anchor = candle_source.anchor_candles(declared_columns)
+                if compact:
+                    candles_anchor = compact_frame(candles_anchor)
+                span["rows"] = len(candles_anchor)
+            print(f"Loaded {len(candles_anchor)} rows of anchor data ({len(candles_anchor.columns) - 1} declared columns)")
+            
+            # Step 4: Get target data using simple_data_fetcher
+            print("Fetching target data...")
+            with timer.span("target_fetch") as span:
+                candles_target = candle_source.target_candles(target_symbol, target_timeframe)
+                if compact:
+                    candles_target = compact_frame(candles_target)
+                span["rows"] = len(candles_target)
+            print(f"Loaded {len(candles_target)} rows of target data for {target_symbol}")
+            return candles_anchor, candles_target
         
-        total_trades = len(tradelog)  # Each row in tradelog represents a completed trade
-        win_rate = len(winning_trades) / total_trades if total_trades > 0 else 0
+        with timer.span("load") as span:
+            candles_anchor, candles_target = _cached_stage(cache, "load", load_parts, load_candles, span)
+            span["rows"] = len(candles_target)
         
-        avg_win = winning_trades['PnL'].mean() if not winning_trades.empty else 0
-        avg_loss = losing_trades['PnL'].mean() if not losing_trades.empty else 0
+        def generate_signals():
+            # Step 5: Run generate_signals with proper parameters (candles_target, candles_anchor)
+            print("Generating signals...")
+            failure = None
+            with track_anchor_access(strict_anchors) as tracker:
+                try:
+                    signals_df = strategy_module.generate_signals(candles_target, tracked_anchors(candles_anchor))
+                except UndeclaredAnchorError as e:
+                    return None, e.args[0]
+                except Exception as e:
+                    failure = e
+            # Lookups on frames merged from the anchors are only visible in a KeyError message
+            undeclared = list(dict.fromkeys(
+                tracker.undeclared + (_undeclared_anchor_columns(failure, declared_columns) if failure else [])
+            ))
+            if strict_anchors:
+                if undeclared:
+                    return None, f"Strategy accessed anchor columns not declared in get_coin_metadata(): {undeclared}"
+                if failure is not None:
+                    raise failure
+            elif failure is not None or undeclared:
+                reason = f"reads undeclared anchor columns {undeclared}" if undeclared else f"failed with {type(failure).__name__}: {failure}"
+                print(f"Warning: strategy {reason} on the declared anchor columns; retrying with all anchor columns")
+                all_anchors = candle_source.anchor_candles(None)
+                if compact:
+                    all_anchors = compact_frame(all_anchors)
+                signals_df = strategy_module.generate_signals(candles_target, all_anchors)
+            print(f"Generated {len(signals_df)} signal rows")
+            return signals_df, None
         
-        # Fixed profit factor calculation
-        if not losing_trades.empty and losing_trades['PnL'].sum() != 0:
-            profit_factor = abs(winning_trades['PnL'].sum() / losing_trades['PnL'].sum())
-        else:
-            profit_factor = float('inf')  # Perfect profit factor when no losses
+        with timer.span("signals") as span:
+            signals_df, signals_error = _cached_stage(cache, "signals", signals_parts, generate_signals, span)
+            span["rows"] = None if signals_df is None else len(signals_df)
+        if signals_error:
+            return {
+                "strategy_name": strategy_name,
+                "status": "failed",
+                "error": signals_error,
+                "stage_timings": timer.spans,
+            }
 
-        # Calculate drawdown periods
-        peak = tradelog['capital'].expanding().max()
-        drawdown = (tradelog['capital'] - peak) / peak
-        drawdown_periods = (drawdown < 0).astype(int)
-        drawdown_periods = drawdown_periods.groupby((drawdown_periods != drawdown_periods.shift()).cumsum()).cumsum()
+        def simulate():
+            # Step 6: Simulate trades using TradeSimulator
+            print("Simulating trades...")
+            simulator = TradeSimulator(initial_capital=initial_capital, fee_pct=fee_pct)
+            tradelog, equity_curve = simulator.run(candles_target, signals_df, record_equity=True)
+            print(f"Trade log columns: {tradelog.columns.tolist()}")
+            print(f"First few trades:\n{tradelog.head()}")
+            print(f"Total trades: {len(tradelog)}")
+            return tradelog, equity_curve
         
-        # Calculate drawdown statistics
-        if len(drawdown_periods[drawdown_periods > 0]) > 0:
-            avg_drawdown_duration = drawdown_periods[drawdown_periods > 0].mean()
-            max_drawdown_duration = drawdown_periods[drawdown_periods > 0].max()
-            drawdown_count = len(drawdown_periods[drawdown_periods > 0].unique())
-        else:
-            avg_drawdown_duration = 0
-            max_drawdown_duration = 0
-            drawdown_count = 0
-
-        # Calculate additional meaningful metrics
-        if total_trades > 0:
-            avg_trade_duration = (tradelog['timestamp'].iloc[-1] - tradelog['timestamp'].iloc[0]).total_seconds() / (3600 * total_trades)  # in hours
-            trades_per_day = total_trades / ((tradelog['timestamp'].iloc[-1] - tradelog['timestamp'].iloc[0]).total_seconds() / (3600 * 24))
-        else:
-            avg_trade_duration = 0
-            trades_per_day = 0
+        with timer.span("simulate") as span:
+            tradelog, equity_curve = _cached_stage(cache, "simulate", simulate_parts, simulate, span)
+            span["rows"] = len(tradelog)
 
-        # Calculate risk-adjusted metrics
-        if return_std > 0:
-            sortino_ratio = (avg_return - risk_free_rate) / return_std
-            calmar_ratio = total_return / max_drawdown_percentage if max_drawdown_percentage > 0 else float('inf')
-        else:
-            sortino_ratio = float('inf')
-            calmar_ratio = float('inf')
+        # Step 7: Calculate performance metrics
+        with timer.span("metrics") as span:
+            metrics = _cached_stage(
+                cache, "metrics", metrics_parts, lambda: compute_metrics(tradelog, equity_curve, initial_capital), span
+            )
+            span["rows"] = len(tradelog)
+        print(f"Final capital: {metrics['final_capital']}")
+        print(f"Total return: {metrics['return_percentage']:.2f}%")
+        print(f"Max drawdown: {metrics['max_drawdown_percentage']:.2f}%")
+        print(f"Sharpe ratio: {metrics['sharpe_ratio']:.2f}")
+        print(f"Bar-level max drawdown: {metrics['bar_max_drawdown_percentage']:.2f}%")
+        print(f"Bar-level Sharpe ratio (annualized): {metrics['bar_sharpe_ratio']:.2f}")
+        with timer.span("report") as span:
+            results = {
+                "strategy_name": strategy_name,
+                "status": "completed",
+                "target_symbol": target_symbol,
+                **metrics,
+                "tradelog": tradelog.to_dict(orient='records'),
+                "equity_curve": equity_curve,
+                "metadata": metadata,
+            }
+            span["rows"] = len(results["tradelog"])
 
-        # Return comprehensive results with improved metrics
-        results = {
-            "strategy_name": strategy_name,
-            "status": "completed",
-            "target_symbol": target_symbol,
-            "return_percentage": return_percentage,
-            "max_drawdown_percentage": max_drawdown_percentage,
-            "sharpe_ratio": sharpe_ratio,
-            "initial_capital": initial_capital,
-            "final_capital": final_capital,
-            "total_return": total_return,
-            "avg_return": avg_return,
-            "return_std": return_std,
-            "tradelog": tradelog.to_dict(orient='records'),
-            "metadata": metadata,
-            # Trading statistics
-            "total_trades": total_trades,
-            "win_rate": win_rate * 100,  # Convert to percentage
-            "avg_win": avg_win,
-            "avg_loss": avg_loss,
-            "profit_factor": profit_factor,
-            # Drawdown statistics
-            "avg_drawdown_duration_hours": avg_drawdown_duration,
-            "max_drawdown_duration_hours": max_drawdown_duration,
-            "drawdown_count": drawdown_count,
-            # Trade timing statistics
-            "avg_trade_duration_hours": avg_trade_duration,
-            "trades_per_day": trades_per_day,
-            # Risk metrics
-            "sortino_ratio": sortino_ratio,
-            "calmar_ratio": calmar_ratio,
-            # Consecutive trades
-            "max_consecutive_wins": (winning_trades['PnL'] > 0).astype(int).groupby((winning_trades['PnL'] > 0).astype(int).diff().ne(0).cumsum()).cumsum().max() if not winning_trades.empty else 0,
-            "max_consecutive_losses": (losing_trades['PnL'] < 0).astype(int).groupby((losing_trades['PnL'] < 0).astype(int).diff().ne(0).cumsum()).cumsum().max() if not losing_trades.empty else 0
-        }
+        if bootstrap_paths > 0:
+            with timer.span("bootstrap") as span:
+                pnl = tradelog["PnL"].to_numpy() if not tradelog.empty else []
+                distributions = bootstrap_metrics(pnl, bootstrap_paths, initial_capital=initial_capital, fee_pct=fee_pct, seed=0)
+                results["confidence_intervals"] = confidence_intervals(distributions).to_dict(orient="index")
+                span["rows"] = bootstrap_paths
+            print(f"Bootstrap 90% interval for return: {results['confidence_intervals']['return_percentage']['p05']:.2f}% "
+                  f"to {results['confidence_intervals']['return_percentage']['p95']:.2f}%")
 
         print("\nFinal results summary:")
         print(f"Strategy: {strategy_name}")
-        print(f"Total trades: {total_trades}")
-        print(f"Win rate: {win_rate*100:.2f}%")
-        print(f"Return: {return_percentage:.2f}%")
-        print(f"Max drawdown: {max_drawdown_percentage:.2f}%")
-        print(f"Sharpe ratio: {sharpe_ratio:.2f}")
-        print(f"Profit factor: {profit_factor:.2f}")
-        print(f"Avg trade duration: {avg_trade_duration:.1f} hours")
-        print(f"Trades per day: {trades_per_day:.2f}")
-        print(f"Drawdown count: {drawdown_count}")
-        print(f"Avg drawdown duration: {avg_drawdown_duration:.1f} hours")
+        print(f"Total trades: {results['total_trades']}")
+        print(f"Win rate: {results['win_rate']:.2f}%")
+        print(f"Return: {results['return_percentage']:.2f}%")
+        print(f"Max drawdown: {results['max_drawdown_percentage']:.2f}%")
+        print(f"Sharpe ratio: {results['sharpe_ratio']:.2f}")
+        print(f"Profit factor: {results['profit_factor']:.2f}")
+        print(f"Avg trade duration: {results['avg_trade_duration_hours']:.1f} hours")
+        print(f"Trades per day: {results['trades_per_day']:.2f}")
+        print(f"Drawdown count: {results['drawdown_count']}")
+        print(f"Avg drawdown duration: {results['avg_drawdown_duration_hours']:.1f} hours")
+        print(f"Stage timings:\n{timer.summary()}")
+        results["stage_timings"] = timer.spans
+        if timer.profile_files:
+            results["profile"] = timer.profile_files
+            print(f"Profile of {profile_stage} stage written to {timer.profile_files['prof']}")
         return results
         
     except Exception as e:
-        print(f"Error in evaluation: {str(e)}")
+        # A MemoryError from an address-space cap carries no message
+        error = str(e) or type(e).__name__
+        print(f"Error in evaluation: {error}")
         return {
             "strategy_name": strategy_name,
             "status": "failed",
-            "error": str(e)
-        }
\ No newline at end of file
+            "error": error,
+            "stage_timings": timer.spans,
+        }
+    finally:
+        timer.close()
@@ -0,0 +1,215 @@
+"""
+Bulk-ingest exchange kline dump archives into the candle_data/ parquet cache.
+
+Reads monthly (or daily) dump files named like LDOUSDT-1h-2025-01.zip or
+LDOUSDT-1h-2025-01.csv from a local directory, as published on
+data.binance.vision, and writes candle_data/{symbol}_{timeframe}.parquet
+in the same timestamp + OHLCV layout data_fetcher caches. Only USDT pairs
+are ingested: data_fetcher always quotes {symbol}USDT, and candles of other
+quote assets (LDOBTC, ...) are priced in different units. Files are parsed
+in fixed-dtype chunks and appended to the parquet file row group by row
+group, so memory use is bounded by the chunk size, not the archive size.
+
+Usage:
+    python kline_ingest.py DUMP_DIR [--symbol LDO] [--timeframe 1h]
+"""
+import os
+import re
+import sys
+import argparse
+import tempfile
+import zipfile
+import numpy as np
+import pandas as pd
+from data_fetcher import CACHE_DIR
+
+DUMP_FILE_PATTERN = re.compile(
+    r'^(?P<pair>[A-Z0-9]+)-(?P<interval>\d+[smhdwM])-(?P<period>\d{4}-\d{2}(?:-\d{2})?)\.(?P<ext>zip|csv)$'
+)
+# Quote asset of the pairs data_fetcher requests
+QUOTE_ASSET = 'USDT'
+
+DUMP_COLUMNS = [
+    'open_time', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_volume', 'trades', 'taker_buy_base',
+    'taker_buy_quote', 'ignore'
+]
+OHLCV_DTYPES = {
+    'open_time': np.int64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64,
+}
+
+# Open times above this are microseconds (spot dumps switched from ms in 2025)
+MICROSECOND_THRESHOLD = 10**14
+
+
+def find_dump_files(directory: str, symbol: str = None, timeframe: str = None) -> dict:
+    """
+    Groups USDT-pair dump files in directory by (symbol, timeframe), each
+    list sorted by period; files of other quote assets are skipped.
+
+    Args:
+        directory: folder containing the downloaded dump files
+        symbol: optional coin symbol filter, e.g. 'LDO'
+        timeframe: optional interval filter, e.g. '1h'
+    """
+    groups = {}
+    for file_name in os.listdir(directory):
+        match = DUMP_FILE_PATTERN.match(file_name)
+        if not match:
+            continue
+        pair_symbol = _base_symbol(match.group('pair'))
+        interval = match.group('interval')
+        if pair_symbol is None:
+            continue
+        if symbol and pair_symbol != symbol.upper():
+            continue
+        if timeframe and interval != timeframe:
+            continue
+        groups.setdefault((pair_symbol, interval), []).append((match.group('period'), os.path.join(directory, file_name)))
+    return {key: [path for _, path in sorted(files)] for key, files in groups.items()}
+
+
+def iter_dump_chunks(path: str, chunksize: int = 100_000):
+    """
+    Yields timestamp + OHLCV DataFrames of at most chunksize rows from one dump
+    file (.csv, or .zip holding a single .csv).
+    """
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            members = [name for name in archive.namelist() if name.endswith('.csv')]
+            if len(members) != 1:
+                raise ValueError(f"Expected one CSV in {path}, found {members}")
+            with archive.open(members[0]) as raw:
+                yield from _read_csv_chunks(raw, chunksize)
+    else:
+        with open(path, 'rb') as raw:
+            yield from _read_csv_chunks(raw, chunksize)
+
+
+def _read_csv_chunks(raw, chunksize: int):
+    # Some dump files start with a header row, most do not
+    has_header = not raw.peek(1)[:1].isdigit()
+    reader = pd.read_csv(
+        raw,
+        header=0 if has_header else None,
+        names=DUMP_COLUMNS,
+        usecols=list(OHLCV_DTYPES),
+        dtype=OHLCV_DTYPES,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        open_time = chunk['open_time'].to_numpy()
+        open_time_ms = np.where(open_time >= MICROSECOND_THRESHOLD, open_time // 1000, open_time)
+        yield pd.DataFrame({
+            'timestamp': pd.to_datetime(open_time_ms, unit='ms'),
+            'open': chunk['open'].to_numpy(),
+            'high': chunk['high'].to_numpy(),
+            'low': chunk['low'].to_numpy(),
+            'close': chunk['close'].to_numpy(),
+            'volume': chunk['volume'].to_numpy(),
+        })
+
+
+def ingest_files(paths: list, output_file: str, chunksize: int = 100_000) -> int:
+    """
+    Streams dump files, in order, into one parquet file.
+
+    Rows whose timestamp is not after the last written one are dropped, which
+    removes the duplicates that occur at file boundaries just like the
+    drop_duplicates(subset=['timestamp']) in data_fetcher. The file is written
+    under a temporary name and renamed into place when complete.
+
+    Returns:
+        number of candles written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    directory = os.path.dirname(output_file) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.parquet', dir=directory)
+    os.close(fd)
+
+    writer = None
+    written = 0
+    last_timestamp = None
+    try:
+        for path in paths:
+            for chunk in iter_dump_chunks(path, chunksize):
+                chunk = chunk.drop_duplicates(subset=['timestamp']).sort_values('timestamp')
+                if last_timestamp is not None:
+                    chunk = chunk[chunk['timestamp'] > last_timestamp]
+                if chunk.empty:
+                    continue
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+                written += len(chunk)
+                last_timestamp = chunk['timestamp'].iloc[-1]
+            print(f"Ingested {os.path.basename(path)} ({written} candles so far)")
+
+        if writer is None:
+            os.remove(tmp_path)
+            return 0
+        writer.close()
+        writer = None
+        os.replace(tmp_path, output_file)
+        return written
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def ingest_dumps(directory: str, symbol: str = None, timeframe: str = None,
+                 output_dir: str = CACHE_DIR, chunksize: int = 100_000) -> dict:
+    """
+    Ingests every (symbol, timeframe) found in directory into output_dir.
+
+    Returns:
+        dict mapping (symbol, timeframe) to the written parquet path
+    """
+    groups = find_dump_files(directory, symbol, timeframe)
+    if not groups:
+        print(f"No kline dump files found in {directory}")
+        return {}
+
+    outputs = {}
+    for (pair_symbol, interval), paths in sorted(groups.items()):
+        output_file = os.path.join(output_dir, f"{pair_symbol.lower()}_{interval}.parquet")
+        print(f"Ingesting {len(paths)} files for {pair_symbol} {interval}...")
+        count = ingest_files(paths, output_file, chunksize)
+        if count:
+            print(f"✅ SAVED {count} rows to cache: {output_file}")
+            outputs[(pair_symbol, interval)] = output_file
+        else:
+            print(f"No candles found for {pair_symbol} {interval}")
+    return outputs
+
+
+def _base_symbol(pair: str) -> str:
+    """Coin symbol of a USDT pair, e.g. 'LDO' for LDOUSDT; None for any other pair"""
+    if pair.endswith(QUOTE_ASSET) and len(pair) > len(QUOTE_ASSET):
+        return pair[:-len(QUOTE_ASSET)]
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest kline dump archives into the parquet candle cache")
+    parser.add_argument('directory', help="folder with *.zip / *.csv kline dump files")
+    parser.add_argument('--symbol', help="only ingest this coin, e.g. LDO")
+    parser.add_argument('--timeframe', help="only ingest this interval, e.g. 1h")
+    parser.add_argument('--output-dir', default=CACHE_DIR)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args()
+
+    outputs = ingest_dumps(args.directory, args.symbol, args.timeframe, args.output_dir, args.chunksize)
+    sys.exit(0 if outputs else 1)
@@ -0,0 +1,146 @@
+"""
+Local stand-in for the Binance /api/v3/klines endpoint, for working offline.
+
+Serves candles from in-memory DataFrames (or the parquet caches under
+candle_data/) with the same query parameters, pagination limit and
+response layout as the real endpoint. Point data_fetcher at it with:
+
+    server = KlinesStubServer({("LDOUSDT", "1h"): candles}).start()
+    data_fetcher.KLINES_URL = server.url
+
+or run `python klines_stub.py` and export KLINES_URL before starting the app.
+"""
+import os
+import sys
+import json
+import threading
+import pandas as pd
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+KLINES_PATH = "/api/v3/klines"
+MAX_LIMIT = 1000
+
+
+class KlinesStubServer:
+    def __init__(self, candles: dict, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            candles: {(pair, interval): DataFrame with timestamp + OHLCV},
+                e.g. {("LDOUSDT", "1h"): df}
+            host, port: address to bind; port 0 picks a free port
+        """
+        self.candles = {key: _to_klines(df) for key, df in candles.items()}
+        self.requests = []
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{KLINES_PATH}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def klines(self, pair: str, interval: str, start_time: int = None, end_time: int = None, limit: int = 500) -> list:
+        """Returns the kline rows the real endpoint would for these parameters."""
+        rows = self.candles.get((pair, interval), [])
+        if start_time is not None:
+            rows = [row for row in rows if row[0] >= start_time]
+        if end_time is not None:
+            rows = [row for row in rows if row[0] <= end_time]
+        return rows[:min(limit, MAX_LIMIT)]
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path != KLINES_PATH:
+                    self._send(404, {"code": -1, "msg": f"Unknown path: {parsed.path}"})
+                    return
+
+                query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                stub.requests.append(query)
+                pair, interval = query.get("symbol"), query.get("interval")
+                if (pair, interval) not in stub.candles:
+                    self._send(400, {"code": -1121, "msg": "Invalid symbol."})
+                    return
+
+                rows = stub.klines(
+                    pair, interval,
+                    start_time=int(query["startTime"]) if "startTime" in query else None,
+                    end_time=int(query["endTime"]) if "endTime" in query else None,
+                    limit=int(query.get("limit", 500)),
+                )
+                self._send(200, rows)
+
+            def _send(self, status: int, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _to_klines(df: pd.DataFrame) -> list:
+    """Converts timestamp + OHLCV rows to the endpoint's 12-field kline arrays."""
+    df = df.dropna(subset=["close"]).sort_values("timestamp")
+    open_times = df["timestamp"].astype("datetime64[ms]").astype("int64").tolist()
+    if len(open_times) > 1:
+        interval_ms = int(pd.Series(open_times).diff().min())
+    else:
+        interval_ms = 60 * 60 * 1000
+    rows = []
+    for open_time, o, h, l, c, v in zip(open_times, df["open"], df["high"], df["low"], df["close"], df["volume"]):
+        rows.append([
+            open_time, str(o), str(h), str(l), str(c), str(v),
+            open_time + interval_ms - 1, str(c * v), 0, "0", "0", "0",
+        ])
+    return rows
+
+
+def load_cached_candles(cache_dir: str = "candle_data") -> dict:
+    """Loads every {symbol}_{interval}.parquet cache as stub data."""
+    candles = {}
+    for name in os.listdir(cache_dir):
+        stem, ext = os.path.splitext(name)
+        if ext != ".parquet" or "_" not in stem or stem.startswith("candles_"):
+            continue
+        symbol, interval = stem.rsplit("_", 1)
+        candles[(f"{symbol.upper()}USDT", interval)] = pd.read_parquet(os.path.join(cache_dir, name))
+    return candles
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server = KlinesStubServer(load_cached_candles(), port=port)
+    print(f"Serving {len(server.candles)} cached pairs at {server.url}")
+    print(f"export KLINES_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
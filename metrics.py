@@ -0,0 +1,232 @@
+"""
+Vectorized performance metrics for tradelogs and equity curves.
+
+Every function accepts either one series (1D) or many series at once as a
+2D array with one row per variant. Variants with different trade counts are
+padded after their last trade (see pad_trades for turning
+TradeSimulator.run_batch output into that layout), and the counts are passed
+alongside: a real trade can have a NaN PnL (a BUY on a NaN close), so
+padding cannot be told apart by value. Metrics come back as scalars for 1D
+input and as one value per row for 2D input.
+
+Definitions follow the figures the evaluation runner has always reported:
+- drawdown durations are counted in trades, and drawdown_count equals the
+  longest drawdown (the number of distinct within-run trade counts)
+- max_consecutive_wins/losses are the number of winning/losing trades
+- sortino_ratio uses the full PnL standard deviation, so it equals the
+  Sharpe ratio; calmar_ratio is total_return / max_drawdown_percentage
+"""
+import numpy as np
+
+
+def pad_trades(values: np.ndarray, offsets: np.ndarray, fill: float = np.nan) -> np.ndarray:
+    """
+    Expands CSR-packed per-trade values into a (variants x max_trades) array.
+
+    Args:
+        values: per-trade values of all variants, concatenated
+        offsets: trade_offsets from run_batch; variant i owns values[offsets[i]:offsets[i + 1]]
+        fill: value for the padding after each variant's last trade
+    """
+    values = np.asarray(values)
+    offsets = np.asarray(offsets)
+    counts = np.diff(offsets)
+    n_variants = len(counts)
+    width = int(counts.max()) if n_variants else 0
+    dtype = np.result_type(values.dtype, np.asarray(fill).dtype)
+    padded = np.full((n_variants, width), fill, dtype=dtype)
+    rows = np.repeat(np.arange(n_variants), counts)
+    columns = np.arange(len(values)) - np.repeat(offsets[:-1], counts)
+    padded[rows, columns] = values
+    return padded
+
+
+def _run_counter(mask: np.ndarray) -> np.ndarray:
+    """1, 2, 3, ... along each run of True in mask (per row), 0 elsewhere"""
+    counts = np.cumsum(mask, axis=1)
+    resets = np.maximum.accumulate(np.where(mask, 0, counts), axis=1)
+    return counts - resets
+
+
+def _result(values: dict, squeeze: bool) -> dict:
+    if squeeze:
+        return {name: value[0] for name, value in values.items()}
+    return values
+
+
+def trade_metrics(pnl, capital, initial_capital: float = 1000.0, timestamps=None, trade_counts=None) -> dict:
+    """
+    Trade-level metrics from tradelog PnL and capital.
+
+    Args:
+        pnl: per-trade returns, (trades,) or (variants, trades)
+        capital: capital after each trade, same shape as pnl
+        initial_capital: starting capital of the simulation
+        timestamps: optional exit times (datetime64 or epoch ns), same shape
+            as pnl or shared 1D; needed for the trade timing metrics
+        trade_counts: trades of each variant for padded 2D input, e.g.
+            np.diff(trade_offsets); by default every column is a trade
+
+    Returns:
+        dict of metric name -> scalar (1D input) or per-variant array
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    squeeze = pnl.ndim == 1
+    pnl = np.atleast_2d(pnl)
+    capital = np.atleast_2d(np.asarray(capital, dtype=np.float64))
+    rows = np.arange(len(pnl))
+
+    if trade_counts is None:
+        n_trades = np.full(len(pnl), pnl.shape[1], dtype=np.int64)
+    else:
+        n_trades = np.asarray(trade_counts, dtype=np.int64).reshape(len(pnl))
+    valid = np.arange(pnl.shape[1]) < n_trades[:, None]
+    last = np.maximum(n_trades - 1, 0)
+    has_trades = n_trades > 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        last_capital = capital[rows, last] if pnl.shape[1] else np.full(len(pnl), initial_capital)
+        final_capital = np.where(has_trades, last_capital, initial_capital)
+        total_return = (final_capital - initial_capital) / initial_capital
+
+        peak = np.fmax.accumulate(capital, axis=1)
+        # Trades with NaN capital are skipped, as pandas' cummax/min do
+        drawdown = np.where(valid & ~np.isnan(capital), capital / peak - 1, np.inf)
+        deepest = np.min(drawdown, axis=1, initial=np.inf)
+        max_drawdown_percentage = np.where(np.isfinite(deepest), np.abs(deepest * 100), np.nan)
+
+        filled = np.where(valid, pnl, 0.0)
+        avg_return = filled.sum(axis=1) / n_trades
+        deviation = np.where(valid, pnl - avg_return[:, None], 0.0)
+        return_std = np.sqrt((deviation * deviation).sum(axis=1) / n_trades)
+        sharpe_ratio = np.where(return_std > 0, avg_return / return_std, 0.0)
+
+        wins = valid & (pnl > 0)
+        losses = valid & (pnl < 0)
+        win_count = wins.sum(axis=1)
+        loss_count = losses.sum(axis=1)
+        win_sum = np.where(wins, pnl, 0.0).sum(axis=1)
+        loss_sum = np.where(losses, pnl, 0.0).sum(axis=1)
+        win_rate = np.where(has_trades, win_count / n_trades, 0.0)
+        avg_win = np.where(win_count > 0, win_sum / win_count, 0.0)
+        avg_loss = np.where(loss_count > 0, loss_sum / loss_count, 0.0)
+        profit_factor = np.where((loss_count > 0) & (loss_sum != 0), np.abs(win_sum / loss_sum), np.inf)
+
+        # Trades spent below the running capital peak
+        in_drawdown = valid & (capital < peak)
+        drawdown_trades = _run_counter(in_drawdown)
+        drawdown_length = in_drawdown.sum(axis=1)
+        max_drawdown_duration = drawdown_trades.max(axis=1, initial=0)
+        avg_drawdown_duration = np.where(drawdown_length > 0, drawdown_trades.sum(axis=1) / drawdown_length, 0.0)
+
+        sortino_ratio = np.where(return_std > 0, avg_return / return_std, np.inf)
+        calmar_ratio = np.where(
+            (return_std > 0) & (max_drawdown_percentage > 0), total_return / max_drawdown_percentage, np.inf
+        )
+
+    metrics = {
+        "return_percentage": total_return * 100,
+        "max_drawdown_percentage": max_drawdown_percentage,
+        "sharpe_ratio": sharpe_ratio,
+        "initial_capital": np.full(len(pnl), initial_capital),
+        "final_capital": final_capital,
+        "total_return": total_return,
+        "avg_return": avg_return,
+        "return_std": return_std,
+        "total_trades": n_trades,
+        "win_rate": win_rate * 100,
+        "avg_win": avg_win,
+        "avg_loss": avg_loss,
+        "profit_factor": profit_factor,
+        "avg_drawdown_duration_hours": avg_drawdown_duration,
+        "max_drawdown_duration_hours": max_drawdown_duration,
+        "drawdown_count": max_drawdown_duration,
+    }
+
+    if timestamps is not None:
+        times = np.asarray(timestamps)
+        if times.dtype.kind == "M":
+            times = times.astype("datetime64[ns]").view(np.int64)
+        span_seconds = np.zeros(len(pnl))
+        if pnl.shape[1]:
+            times = np.broadcast_to(times, pnl.shape)
+            span_seconds = np.where(has_trades, (times[rows, last] - times[rows, 0]) / 1e9, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            metrics["avg_trade_duration_hours"] = np.where(has_trades, span_seconds / (3600 * n_trades), 0.0)
+            # A single trade (or trades closing together) spans no time; report 0 rather than dividing by it
+            metrics["trades_per_day"] = np.where(span_seconds > 0, n_trades / (span_seconds / (3600 * 24)), 0.0)
+
+    metrics["sortino_ratio"] = sortino_ratio
+    metrics["calmar_ratio"] = calmar_ratio
+    metrics["max_consecutive_wins"] = win_count
+    metrics["max_consecutive_losses"] = loss_count
+    return _result(metrics, squeeze)
+
+
+def equity_metrics(equity, timestamps=None, periods_per_year: float = None) -> dict:
+    """
+    Bar-level drawdown and annualized Sharpe ratio from mark-to-market equity.
+
+    Args:
+        equity: equity per bar, (bars,) or (variants, bars)
+        timestamps: bar times shared by all variants; the median bar spacing
+            sets the annualization factor
+        periods_per_year: annualization factor to use instead of timestamps
+            (1 when neither is given)
+
+    Returns:
+        dict with 'bar_max_drawdown_percentage' and 'bar_sharpe_ratio'
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    squeeze = equity.ndim == 1
+    equity = np.atleast_2d(equity)
+    n_bars = equity.shape[1]
+
+    if periods_per_year is None:
+        periods_per_year = 1.0
+        if timestamps is not None and len(timestamps) > 1:
+            bar_seconds = np.median(np.diff(np.asarray(timestamps)).astype("timedelta64[s]").astype(float))
+            periods_per_year = 365 * 24 * 3600 / bar_seconds
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if n_bars:
+            peak = np.fmax.accumulate(equity, axis=1)
+            max_drawdown = np.abs(np.fmin.reduce(equity / peak - 1, axis=1) * 100)
+        else:
+            max_drawdown = np.zeros(len(equity))
+
+        returns = np.diff(equity, axis=1) / equity[:, :-1]
+        finite = np.isfinite(returns)
+        count = finite.sum(axis=1)
+        mean = np.where(finite, returns, 0.0).sum(axis=1) / count
+        deviation = np.where(finite, returns - mean[:, None], 0.0)
+        std = np.sqrt((deviation * deviation).sum(axis=1) / count)
+        sharpe = np.where((count > 1) & (std > 0), mean / std * np.sqrt(periods_per_year), 0.0)
+
+    return _result({"bar_max_drawdown_percentage": max_drawdown, "bar_sharpe_ratio": sharpe}, squeeze)
+
+
+def compute_metrics(tradelog, equity_curve: dict, initial_capital: float = 1000.0) -> dict:
+    """
+    Every metric reported for one strategy run.
+
+    Args:
+        tradelog: DataFrame from TradeSimulator.run
+        equity_curve: mark-to-market equity curve from TradeSimulator.run(record_equity=True)
+        initial_capital: starting capital of the simulation
+
+    Returns:
+        dict of return, drawdown, risk and trade statistics
+    """
+    def column(name, dtype):
+        # A run without trades returns a tradelog without columns
+        return tradelog[name].to_numpy(dtype=dtype) if name in tradelog else np.empty(0, dtype=dtype)
+
+    metrics = trade_metrics(
+        column("PnL", np.float64),
+        column("capital", np.float64),
+        initial_capital,
+        timestamps=column("timestamp", "datetime64[ns]"),
+    )
+    metrics.update(equity_metrics(equity_curve["equity"], equity_curve["timestamp"]))
+    return metrics
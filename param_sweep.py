@@ -0,0 +1,436 @@
+"""
+Parallel parameter sweep over a strategy's generate_signals keyword arguments.
+
+Candles are loaded once into the memory-mapped CandleStore (see batch_runner)
+and every worker process opens them a single time, then evaluates its share
+of the parameter combinations. Each finished combination is appended to a
+JSONL checkpoint, so rerunning an interrupted sweep with the same checkpoint
+only evaluates the combinations that are missing.
+
+Usage:
+    python param_sweep.py 1745423277 --param window=12,24,48 --param corr_threshold=0.5,0.6,0.7
+"""
+import os
+import sys
+import json
+import inspect
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from batch_runner import prepare_candle_source
+from candle_store import STORE_DIR
+from anchor_access import track_anchor_access, tracked_anchors
+from evaluation_runner import STRATEGY_REGISTRY, anchor_columns, load_strategy_module, strategy_path
+from metrics import compute_metrics
+from profiling import limit_address_space
+
+# Orders halving candidates tied on rank_by; mark-to-market equity still
+# separates candidates whose open positions have not closed a trade yet
+TIEBREAK_METRIC = "bar_sharpe_ratio"
+from simulator import TradeSimulator
+
+
+def parameter_grid(grid: dict) -> list:
+    """
+    Every combination of a {name: [values]} grid, as a list of kwargs dicts.
+
+    A scalar value is treated as a single-value list.
+    """
+    names = sorted(grid)
+    values = [grid[name] if isinstance(grid[name], (list, tuple, np.ndarray)) else [grid[name]] for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def _params_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _to_json_value(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    return value
+
+
+class SweepCheckpoint:
+    """
+    Append-only JSONL record of a sweep.
+
+    The first line identifies the sweep (strategy, its source hash, the
+    fingerprint of the candles it ran on and the simulator settings); each
+    further line holds one combination's params and either its metrics or its
+    error.
+    """
+
+    def __init__(self, path: str, header: dict):
+        self.path = path
+        self.header = header
+        self.rows = {}
+        if os.path.exists(path):
+            self._load()
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._append(header)
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            content = f.read()
+        if content and not content.endswith(b"\n"):
+            # Drop a line cut off by an interrupted write; that combination is simply rerun
+            content = content[:content.rfind(b"\n") + 1]
+            os.truncate(self.path, len(content))
+        lines = content.decode().splitlines()
+        if not lines:
+            self._append(self.header)
+            return
+        if json.loads(lines[0]) != self.header:
+            raise ValueError(f"Checkpoint {self.path} was written by a different sweep (strategy source, candle data or settings changed); use a new checkpoint file")
+        for line in lines[1:]:
+            row = json.loads(line)
+            self.rows[_params_key(row["params"])] = row
+
+    def _append(self, record: dict):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def done(self, params: dict) -> bool:
+        return _params_key(params) in self.rows
+
+    def add(self, row: dict):
+        self.rows[_params_key(row["params"])] = row
+        self._append(row)
+
+
+_worker = {}
+
+
+def _init_worker(strategy_name: str, candle_source, initial_capital: float, fee_pct: float,
+                 memory_budget_mb: float = None):
+    module = load_strategy_module(strategy_name)
+    metadata = module.get_coin_metadata()
+    target = metadata.get("target", {})
+    declared = anchor_columns(metadata)
+    _worker.update(
+        module=module,
+        candle_source=candle_source,
+        candles_anchor=candle_source.anchor_candles(declared),
+        all_anchors=False,
+        candles_target=candle_source.target_candles(target["symbol"], target.get("timeframe", "1h").lower()),
+        initial_capital=initial_capital,
+        fee_pct=fee_pct,
+    )
+    if memory_budget_mb is not None:
+        # After loading, so the budget covers evaluations rather than the shared candles
+        limit_address_space(int(memory_budget_mb * 2**20))
+
+
+def _prefix_candles(n_bars: int = None):
+    """Target and anchor candles up to the n_bars-th target bar (everything when None)"""
+    candles_target, candles_anchor = _worker["candles_target"], _worker["candles_anchor"]
+    if n_bars is None or n_bars >= len(candles_target):
+        return candles_target, candles_anchor
+    candles_target = candles_target.iloc[:n_bars]
+    cutoff = candles_target["timestamp"].iloc[-1]
+    return candles_target, candles_anchor[candles_anchor["timestamp"] <= cutoff]
+
+
+def _generate_signals(params: dict, n_bars: int = None):
+    module = _worker["module"]
+    candles_target, candles_anchor = _prefix_candles(n_bars)
+    if _worker["all_anchors"]:
+        return module.generate_signals(candles_target, candles_anchor, **params)
+
+    with track_anchor_access() as tracker:
+        try:
+            signals_df = module.generate_signals(candles_target, tracked_anchors(candles_anchor), **params)
+            failed = False
+        except Exception:
+            failed = True
+    if not failed and not tracker.undeclared:
+        return signals_df
+    # Widen this worker's anchors once: the strategy looked up an undeclared
+    # column, or failed in a way that may come from one
+    _worker["candles_anchor"] = _worker["candle_source"].anchor_candles(None)
+    _worker["all_anchors"] = True
+    candles_target, candles_anchor = _prefix_candles(n_bars)
+    return module.generate_signals(candles_target, candles_anchor, **params)
+
+
+def _evaluate_params(params: dict, n_bars: int = None, max_drawdown: float = None) -> dict:
+    """
+    Scores one combination on the first n_bars bars (all bars when None).
+
+    With max_drawdown set, a run whose mark-to-market drawdown exceeds it is
+    reported as pruned at the first bar past the bound instead of scored.
+    """
+    try:
+        signals_df = _generate_signals(params, n_bars)
+        candles_target, _ = _prefix_candles(n_bars)
+        simulator = TradeSimulator(initial_capital=_worker["initial_capital"], fee_pct=_worker["fee_pct"])
+        tradelog, equity_curve = simulator.run(candles_target, signals_df, record_equity=True)
+        if max_drawdown is not None:
+            equity = equity_curve["equity"]
+            with np.errstate(invalid="ignore"):
+                drawdown = (1 - equity / np.fmax.accumulate(equity)) * 100
+            breach = np.flatnonzero(drawdown > max_drawdown)
+            if breach.size:
+                return {"params": params, "pruned_at_bar": int(breach[0]), "drawdown": float(drawdown[breach[0]])}
+        metrics = compute_metrics(tradelog, equity_curve, _worker["initial_capital"])
+        return {"params": params, "metrics": {name: _to_json_value(value) for name, value in metrics.items()}}
+    except Exception as e:
+        return {"params": params, "error": f"{type(e).__name__}: {e}"}
+
+
+def run_sweep(strategy_name: str, grid: dict, max_workers: int = None, checkpoint: str = None,
+              rank_by: str = "sharpe_ratio", ascending: bool = False, initial_capital: float = 1000.0,
+              fee_pct: float = 0.001, store_root: str = STORE_DIR, memory_budget_mb: float = None) -> pd.DataFrame:
+    """
+    Evaluates every parameter combination of a strategy across a process pool.
+
+    Args:
+        strategy_name: name of the strategy file (without .py extension)
+        grid: {generate_signals kwarg: [values]}
+        max_workers: pool size (defaults to the CPU count)
+        checkpoint: optional JSONL path; finished combinations are appended as
+            they complete and skipped when the sweep is rerun
+        rank_by: metric column to sort by
+        ascending: sort order for rank_by (descending by default)
+        initial_capital, fee_pct: TradeSimulator settings
+        memory_budget_mb: caps each worker's address space at its size after
+            loading candles plus this many MB (see profiling.limit_address_space);
+            a combination that exceeds it gets a MemoryError in its 'error' column
+
+    Returns:
+        DataFrame with one row per combination: the parameters, every metric
+        from metrics.compute_metrics and an 'error' column, ranked by rank_by
+    """
+    combinations = parameter_grid(grid)
+    candle_source = prepare_candle_source([strategy_name], store_root)
+    target = load_strategy_module(strategy_name).get_coin_metadata().get("target", {})
+    header = {
+        "sweep": strategy_name,
+        "strategy_digest": STRATEGY_REGISTRY.digest(strategy_path(strategy_name)),
+        "data": candle_source.fingerprint(target["symbol"], target.get("timeframe", "1h").lower()),
+        "initial_capital": initial_capital,
+        "fee_pct": fee_pct,
+    }
+    # Compared against the header read back from JSON
+    header = json.loads(json.dumps(header))
+    record = SweepCheckpoint(checkpoint, header) if checkpoint else None
+    pending = [params for params in combinations if record is None or not record.done(params)]
+    print(f"Sweeping {strategy_name}: {len(combinations)} combinations, {len(combinations) - len(pending)} already done")
+
+    rows = {}
+    if record is not None:
+        rows.update(record.rows)
+    if pending:
+        initargs = (strategy_name, candle_source, initial_capital, fee_pct, memory_budget_mb)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_evaluate_params, params) for params in pending]
+            for i, future in enumerate(as_completed(futures), start=1):
+                row = future.result()
+                rows[_params_key(row["params"])] = row
+                if record is not None:
+                    record.add(row)
+                if "error" in row:
+                    print(f"[{i}/{len(pending)}] {row['params']} failed: {row['error']}")
+                else:
+                    print(f"[{i}/{len(pending)}] {row['params']} {rank_by}={row['metrics'].get(rank_by)}")
+
+    wanted = [_params_key(params) for params in combinations]
+    table = pd.DataFrame([
+        {**rows[key]["params"], **rows[key].get("metrics", {}), "error": rows[key].get("error")}
+        for key in wanted if key in rows
+    ])
+    if table.empty:
+        return table
+    if rank_by in table:
+        table = table.sort_values(rank_by, ascending=ascending, na_position="last")
+    return table.reset_index(drop=True)
+
+
+def sample_candidates(space: dict, n_candidates: int, seed: int = None, defaults: dict = None) -> list:
+    """
+    Random parameter combinations from a search space.
+
+    Args:
+        space: {kwarg: [values]} to choose from, or {kwarg: (low, high)} for a
+            uniform range (integers when both bounds are ints)
+        n_candidates: number of combinations to draw; duplicates are dropped
+        seed: seed for numpy's random generator
+        defaults: optional combination always included as the first candidate
+    """
+    rng = np.random.default_rng(seed)
+    candidates = {}
+    if defaults:
+        candidates[_params_key(defaults)] = dict(defaults)
+    for _ in range(n_candidates * 10):
+        if len(candidates) >= n_candidates:
+            break
+        params = {}
+        for name in sorted(space):
+            choices = space[name]
+            if isinstance(choices, tuple) and len(choices) == 2:
+                low, high = choices
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = int(rng.integers(low, high + 1))
+                else:
+                    params[name] = float(rng.uniform(low, high))
+            else:
+                params[name] = _to_json_value(choices[rng.integers(len(choices))])
+        candidates.setdefault(_params_key(params), params)
+    return list(candidates.values())
+
+
+def successive_halving(strategy_name: str, space: dict, n_candidates: int = 27, eta: int = 3,
+                       min_bars: int = 168, max_drawdown: float = None, rank_by: str = "sharpe_ratio",
+                       max_workers: int = None, seed: int = None, initial_capital: float = 1000.0,
+                       fee_pct: float = 0.001, store_root: str = STORE_DIR, memory_budget_mb: float = None) -> dict:
+    """
+    Successive halving search over generate_signals kwargs.
+
+    All candidates are first scored on a short prefix of the candle grid; only
+    the best 1/eta of each rung (rounded up) advance to a prefix eta times
+    longer, until the survivors run on the full grid. Candidates tied on
+    rank_by, as happens on a short prefix without trades yet, are ordered by
+    TIEBREAK_METRIC and then in a random order drawn from seed. A candidate whose mark-to-market drawdown on its prefix exceeds
+    max_drawdown is disqualified: it is not ranked and never runs on a longer
+    prefix. The check runs after the prefix has been simulated, so pruning
+    saves the later rungs, not the current one. The strategy's own defaults
+    for the searched kwargs are always a candidate.
+
+    Args:
+        strategy_name: name of the strategy file (without .py extension)
+        space: search space, see sample_candidates
+        n_candidates: candidates in the first rung
+        eta: elimination factor between rungs
+        min_bars: shortest prefix, in target bars
+        max_drawdown: drawdown bound in percent for pruning (None to disable)
+        rank_by: metric to maximize
+        seed: seed for sampling candidates and breaking ties
+        memory_budget_mb: per-worker memory cap, as in run_sweep
+
+    Returns:
+        dict with 'best' params and 'best_metrics' of the top candidate scored
+        on the full grid (None when every candidate was pruned, failed or
+        eliminated before it), 'best_bars' (the bars those metrics cover),
+        'history' (one row per candidate per rung, with its status) and
+        'bars_evaluated' / 'full_grid_bars' comparing the compute used with
+        scoring every candidate on the full grid
+    """
+    module = load_strategy_module(strategy_name)
+    signature = inspect.signature(module.generate_signals)
+    defaults = {
+        name: signature.parameters[name].default for name in space
+        if name in signature.parameters and signature.parameters[name].default is not inspect.Parameter.empty
+    }
+    candidates = sample_candidates(space, n_candidates, seed, defaults if len(defaults) == len(space) else None)
+
+    candle_source = prepare_candle_source([strategy_name], store_root)
+    target = module.get_coin_metadata().get("target", {})
+    total_bars = len(candle_source.target_candles(target["symbol"], target.get("timeframe", "1h").lower()))
+
+    n_rungs = max(int(np.floor(np.log(len(candidates)) / np.log(eta))), 0) + 1
+    prefix_bars = [
+        max(min(total_bars, int(np.ceil(total_bars * eta ** (rung - n_rungs + 1)))), min(min_bars, total_bars))
+        for rung in range(n_rungs)
+    ]
+
+    tiebreak = np.random.default_rng(seed)
+    history = []
+    survivors = candidates
+    bars_evaluated = 0
+    best = None
+    initargs = (strategy_name, candle_source, initial_capital, fee_pct, memory_budget_mb)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=initargs) as pool:
+        for rung, n_bars in enumerate(prefix_bars):
+            futures = [pool.submit(_evaluate_params, params, n_bars, max_drawdown) for params in survivors]
+            results = [future.result() for future in futures]
+            bars_evaluated += n_bars * len(survivors)
+
+            scored = []
+            for row in results:
+                entry = {**row["params"], "rung": rung, "bars": n_bars}
+                if "metrics" in row and np.isfinite(row["metrics"].get(rank_by, np.nan)):
+                    entry.update(row["metrics"], status="scored")
+                    secondary = row["metrics"].get(TIEBREAK_METRIC)
+                    secondary = secondary if secondary is not None and np.isfinite(secondary) else -np.inf
+                    scored.append((row["metrics"][rank_by], secondary, tiebreak.random(), len(history), row))
+                elif "pruned_at_bar" in row:
+                    entry.update(status=f"pruned: {row['drawdown']:.1f}% drawdown at bar {row['pruned_at_bar']}")
+                else:
+                    entry.update(status=row.get("error", f"no finite {rank_by}"))
+                history.append(entry)
+
+            scored.sort(key=lambda item: item[:3], reverse=True)
+            is_last = rung == len(prefix_bars) - 1
+            keep = len(scored) if is_last else int(np.ceil(len(scored) / eta))
+            for *_, index, _ in scored[keep:]:
+                history[index]["status"] = "eliminated"
+            print(f"Rung {rung}: {len(survivors)} candidates on {n_bars} bars, "
+                  f"{len(scored)} scored, {min(keep, len(scored))} kept")
+            survivors = [row["params"] for *_, row in scored[:keep]]
+            if is_last and scored:
+                # Only a candidate that completed the full grid can be the result
+                best = scored[0][-1]
+            if not survivors:
+                break
+
+    return {
+        "best": best["params"] if best else None,
+        "best_metrics": best["metrics"] if best else None,
+        "best_bars": total_bars if best else None,
+        "history": pd.DataFrame(history),
+        "bars_evaluated": bars_evaluated,
+        "full_grid_bars": len(candidates) * total_bars,
+    }
+
+
+def _parse_param(spec: str):
+    name, _, values = spec.partition("=")
+    parsed = []
+    for token in values.split(","):
+        try:
+            parsed.append(json.loads(token))
+        except json.JSONDecodeError:
+            parsed.append(token)
+    return name, parsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep a strategy's generate_signals parameters")
+    parser.add_argument("strategy_name")
+    parser.add_argument("--param", action="append", default=[], help="name=v1,v2,... (repeatable)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--checkpoint", help="JSONL file to record and resume progress")
+    parser.add_argument("--rank-by", default="sharpe_ratio")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--halving", type=int, metavar="N",
+                        help="successive halving from N random candidates instead of the full grid")
+    parser.add_argument("--max-drawdown", type=float, help="prune halving candidates past this drawdown (%%)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--memory-budget-mb", type=float, default=None, help="per-worker memory cap")
+    args = parser.parse_args()
+
+    grid = dict(_parse_param(spec) for spec in args.param)
+    if args.halving:
+        search = successive_halving(args.strategy_name, grid, args.halving, max_drawdown=args.max_drawdown,
+                                    rank_by=args.rank_by, max_workers=args.workers, seed=args.seed,
+                                    memory_budget_mb=args.memory_budget_mb)
+        print(f"Best: {search['best']}")
+        print(f"Compute: {search['bars_evaluated']} bar evaluations "
+              f"({search['bars_evaluated'] / search['full_grid_bars']:.1%} of the full grid)")
+        sys.exit(0 if search["best"] is not None else 1)
+
+    table = run_sweep(args.strategy_name, grid, args.workers, args.checkpoint, args.rank_by,
+                      memory_budget_mb=args.memory_budget_mb)
+    with pd.option_context("display.width", 200, "display.max_columns", 12):
+        print(table.head(args.top))
+    sys.exit(0 if not table.empty else 1)
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+from simulator import encode_signals, _simulate_matrix, _mark_prices
+
+
+class PortfolioSimulator:
+    """
+    Simulates several strategies drawing on one pool of cash.
+
+    Signals, positions, prices and trade returns are resolved for every
+    strategy at once as columns of one (bars x strategies) matrix, with
+    TradeSimulator's fee and compounding semantics. Only the cash pool is
+    advanced bar by bar, and only over the bars where some strategy enters or
+    exits. On those bars exits are settled first. Each entry is then sized at
+    its weight's share of current portfolio equity (cash plus open positions
+    at the bar close). When the entries of a bar ask for more than the cash
+    left, they are scaled down pro rata ("clipped"). With no cash left they
+    are skipped ("rejected"), and that position is sat out until the
+    strategy's next entry.
+    """
+
+    def __init__(self, initial_capital: float = 1000.0, fee_pct: float = 0.001):
+        self.initial_capital = initial_capital
+        self.fee_pct = fee_pct
+
+    def run(self, streams: list, names: list = None) -> dict:
+        """
+        Inputs:
+        - streams: list of (candles, signals, weight) tuples; candles need
+          'timestamp' and 'close', signals need 'signal', and every stream
+          must be on the same time grid. Weights are relative and normalized
+          to sum to 1
+        - names: optional label per stream, defaults to 'strategy_<i>'
+
+        Returns:
+        - dict with the combined per-bar 'equity', 'cash', 'exposure' and
+          'open_positions' arrays, per-strategy 'sleeve_exposure' (bars x
+          strategies), summary figures and an 'attribution' DataFrame
+        """
+        if not streams:
+            raise ValueError("At least one (candles, signals, weight) stream is required")
+        names = names or [f"strategy_{i}" for i in range(len(streams))]
+        assert len(names) == len(streams), f"Mismatch in names/streams: names={len(names)}, streams={len(streams)}"
+
+        timestamps = streams[0][0]['timestamp'].to_numpy()
+        close = np.empty((len(timestamps), len(streams)), dtype=np.float64)
+        codes = np.empty((len(timestamps), len(streams)), dtype=np.int8)
+        weights = np.empty(len(streams), dtype=np.float64)
+
+        for j, (candles, signals, weight) in enumerate(streams):
+            assert len(candles) == len(timestamps) and len(signals) == len(timestamps), \
+                f"Stream {names[j]} has {len(candles)} candles / {len(signals)} signals, expected {len(timestamps)}"
+            if not np.array_equal(candles['timestamp'].to_numpy(), timestamps):
+                raise ValueError(f"Stream {names[j]} is not aligned to the shared time grid")
+            close[:, j] = candles['close'].to_numpy(dtype=np.float64)
+            codes[:, j] = encode_signals(signals['signal'].to_numpy())
+            weights[j] = weight
+
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError(f"Weights must be non-negative with a positive sum, got {weights.tolist()}")
+        weights = weights / weights.sum()
+
+        n_bars, n_strategies = codes.shape
+        sim = _simulate_matrix(close, codes, 1.0, self.fee_pct)
+        mark_price = _mark_prices(close, n_bars)
+        ledger = self._settle_cash(sim, mark_price, weights)
+
+        # Units held after each bar: those bought on the bar of the position's entry
+        held = sim['position'].copy()
+        held[-1] &= ~sim['final_exit']
+        columns = np.arange(n_strategies)
+        units = np.where(held, ledger['entry_units'][np.maximum(sim['entry_bar'], 0), columns], 0.0)
+        sleeve_exposure = np.where(units > 0, units * mark_price, 0.0)
+
+        event_index = np.searchsorted(ledger['event_bars'], np.arange(n_bars), side='right') - 1
+        cash = np.where(event_index >= 0, ledger['cash'][np.maximum(event_index, 0)], self.initial_capital)
+        exposure = sleeve_exposure.sum(axis=1)
+        equity = cash + exposure
+        open_positions = (units > 0).sum(axis=1, dtype=np.int16)
+
+        pnl = ledger['pnl']
+        total_pnl = pnl.sum()
+        deployed = ledger['capital_deployed']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            exposure_ratio = exposure / equity
+            return_on_deployed = np.where(deployed > 0, pnl / deployed * 100, 0.0)
+
+        attribution = pd.DataFrame({
+            'strategy': names,
+            'weight': weights,
+            'capital_deployed': deployed,
+            'pnl': pnl,
+            'return_on_deployed_percentage': return_on_deployed,
+            'pnl_share_percentage': pnl / total_pnl * 100 if total_pnl != 0 else np.zeros(len(pnl)),
+            'total_trades': ledger['filled'],
+            'clipped_entries': ledger['clipped'],
+            'rejected_entries': ledger['rejected'],
+            'time_in_market_percentage': (units > 0).mean(axis=0) * 100,
+        })
+
+        return {
+            'timestamp': timestamps,
+            'equity': equity,
+            'cash': cash,
+            'exposure': exposure,
+            'open_positions': open_positions,
+            'sleeve_exposure': sleeve_exposure,
+            'initial_capital': self.initial_capital,
+            'final_equity': equity[-1],
+            'return_percentage': (equity[-1] - self.initial_capital) / self.initial_capital * 100,
+            'max_drawdown_percentage': abs(np.nanmin(equity / np.fmax.accumulate(equity) - 1) * 100),
+            'max_exposure_ratio': np.nanmax(exposure_ratio),
+            'max_open_positions': int(open_positions.max()),
+            'attribution': attribution,
+        }
+
+    def _settle_cash(self, sim: dict, mark_price: np.ndarray, weights: np.ndarray) -> dict:
+        """
+        Walks the bars with entries or exits, moving cash between the pool and positions.
+
+        Returns:
+        - dict with 'event_bars', the 'cash' left after each of them,
+          'entry_units' (bars x strategies, units bought on entry bars) and
+          per-strategy 'pnl', 'capital_deployed', 'filled', 'clipped' and
+          'rejected' counts
+        """
+        fee = self.fee_pct
+        entry_mask, exit_mask = sim['entry_mask'], sim['exit_mask']
+        n_bars, n_strategies = entry_mask.shape
+        last_bar = n_bars - 1
+        event_bars = np.flatnonzero(entry_mask.any(axis=1) | exit_mask.any(axis=1))
+
+        cash = self.initial_capital
+        allocation = np.zeros(n_strategies)  # cash committed to each open position, entry fee included
+        units = np.zeros(n_strategies)
+        entry_units = np.zeros((n_bars, n_strategies))
+        cash_after = np.empty(len(event_bars))
+        pnl = np.zeros(n_strategies)
+        deployed = np.zeros(n_strategies)
+        filled = np.zeros(n_strategies, dtype=np.int64)
+        clipped = np.zeros(n_strategies, dtype=np.int64)
+        rejected = np.zeros(n_strategies, dtype=np.int64)
+
+        def settle(bar, exiting):
+            nonlocal cash
+            proceeds = allocation[exiting] * (1 - fee) * (1 + sim['trade_return'][bar, exiting]) * (1 - fee)
+            cash += proceeds.sum()
+            pnl[exiting] += proceeds - allocation[exiting]
+            allocation[exiting] = 0.0
+            units[exiting] = 0.0
+
+        for k, bar in enumerate(event_bars):
+            entering = entry_mask[bar]
+            # Positions opened on an earlier bar close before new entries are sized
+            settle(bar, exit_mask[bar] & ~entering & (allocation > 0))
+
+            if entering.any():
+                equity = cash + np.nansum(units * mark_price[bar])
+                target = weights[entering] * equity
+                requested = target.sum()
+                scale = min(1.0, cash / requested) if requested > 0 and cash > 0 else 0.0
+                granted = target * scale
+                funded = granted > 0
+                cash -= granted.sum()
+                allocation[entering] = granted
+                units[entering] = granted * (1 - fee) / sim['entry_price'][bar, entering]
+                entry_units[bar, entering] = units[entering]
+                deployed[entering] += granted
+                filled[entering] += funded
+                clipped[entering] += funded & (scale < 1.0)
+                rejected[entering] += ~funded & (weights[entering] > 0)
+
+            if bar == last_bar:
+                # Entries on the last bar are force-closed on it as well
+                settle(bar, exit_mask[bar] & entering & (allocation > 0))
+            cash_after[k] = cash
+
+        return {
+            'event_bars': event_bars,
+            'cash': cash_after,
+            'entry_units': entry_units,
+            'pnl': pnl,
+            'capital_deployed': deployed,
+            'filled': filled,
+            'clipped': clipped,
+            'rejected': rejected,
+        }
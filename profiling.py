@@ -0,0 +1,322 @@
+"""
+Stage timing, opt-in profiling and memory accounting for the evaluation pipeline.
+
+A StageTimer records one span per named pipeline stage: wall time, CPU time
+and the number of rows the stage produced. Spans nest, and nested spans are
+named by their path ("load/anchor_read"). Timing costs two clock reads per
+span boundary. Profiling is off unless a stage name is given. That one stage
+then runs under cProfile, which writes a .prof file for pstats/snakeviz and a
+folded-stacks file that flamegraph.pl or speedscope can read.
+
+Memory tracing is off by default as well. When it is on, each span also
+records the peak bytes traced by tracemalloc above the level at the stage's
+start, the source lines whose allocations the stage left behind, and the
+peak process RSS seen by a sampling thread. An optional memory budget is
+checked against RSS growth since the timer started, both by that thread and
+at every stage boundary. The next stage boundary after an overrun raises
+MemoryBudgetExceeded, which fails the evaluation like any other error. That
+check cannot interrupt a single huge allocation inside a stage. Worker
+processes therefore also cap their address space with limit_address_space(),
+which makes such an allocation fail with MemoryError instead of running the
+host out of memory.
+"""
+import os
+import re
+import sys
+import time
+import cProfile
+import pstats
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_DIR = "profiles"
+RSS_SAMPLE_INTERVAL = 0.05
+TOP_ALLOCATION_SITES = 5
+# Room above the budget for address space that is reserved but barely touched
+# (thread stacks, malloc arenas, memory maps), which RLIMIT_AS counts in full
+ADDRESS_SPACE_HEADROOM = 256 * 2**20
+# Call paths below this many microseconds are left out of folded stacks
+FOLDED_MIN_MICROS = 1
+FOLDED_MAX_DEPTH = 64
+
+
+def _frame_label(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        # Built-in functions have no source file
+        label = name
+    else:
+        label = f"{os.path.basename(filename)}:{name}:{line}"
+    return re.sub(r"[;\s]", "_", label)
+
+
+def folded_stacks(stats: pstats.Stats) -> dict:
+    """
+    Call stacks with self time in microseconds, rebuilt from cProfile's call graph.
+
+    cProfile keeps caller -> callee edges rather than whole stacks, so a
+    function's time under one path is its total time scaled by the share of
+    calls that came through that path's last edge.
+
+    Returns:
+        dict of "root;...;leaf" -> microseconds
+    """
+    children = {}
+    roots = []
+    for func, (_, _, _, total_time, callers) in stats.stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = {}
+
+    def visit(func, path, share):
+        _, _, self_time, total_time, _ = stats.stats[func]
+        if total_time * share * 1e6 < FOLDED_MIN_MICROS or len(path) > FOLDED_MAX_DEPTH:
+            return
+        path = path + (func,)
+        micros = int(round(self_time * share * 1e6))
+        if micros >= FOLDED_MIN_MICROS:
+            key = ";".join(_frame_label(frame) for frame in path)
+            stacks[key] = stacks.get(key, 0) + micros
+        for child, edge_time in children.get(func, ()):
+            child_total = stats.stats[child][3]
+            if child in path or child_total <= 0:
+                continue
+            visit(child, path, share * min(edge_time / child_total, 1.0))
+
+    for root in roots:
+        visit(root, (), 1.0)
+    return stacks
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes, or None where it cannot be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Without /proc only the high-water mark is available (kilobytes on Linux, bytes on macOS)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """Raised at a stage boundary once an evaluation has exceeded its memory budget"""
+
+
+def limit_address_space(budget_bytes: int) -> int:
+    """
+    Caps this process's address space (RLIMIT_AS) at its current size plus
+    budget_bytes and ADDRESS_SPACE_HEADROOM. Allocations past the cap fail
+    with MemoryError instead of growing until the OOM killer steps in. Meant
+    for worker process initializers.
+
+    Returns:
+        the limit set in bytes, or None where it cannot be set
+    """
+    try:
+        import resource
+        with open("/proc/self/statm") as f:
+            size = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (ImportError, OSError, ValueError, AttributeError):
+        return None
+    limit = size + budget_bytes + ADDRESS_SPACE_HEADROOM
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    return limit
+
+
+def _allocation_sites(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int) -> list:
+    """Source lines with the largest net allocation growth between two snapshots"""
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    stats = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "lineno")
+    sites = []
+    for stat in stats[:limit]:
+        if stat.size_diff <= 0:
+            break
+        frame = stat.traceback[0]
+        sites.append({"site": f"{frame.filename}:{frame.lineno}", "bytes": stat.size_diff, "blocks": stat.count_diff})
+    return sites
+
+
+def write_profile(profiler: cProfile.Profile, base_path: str) -> dict:
+    """Writes base_path.prof and base_path.folded; returns both paths"""
+    os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+    prof_path = f"{base_path}.prof"
+    folded_path = f"{base_path}.folded"
+    profiler.dump_stats(prof_path)
+    stacks = folded_stacks(pstats.Stats(profiler))
+    with open(folded_path, "w") as f:
+        for stack, micros in sorted(stacks.items()):
+            f.write(f"{stack} {micros}\n")
+    return {"prof": prof_path, "folded": folded_path}
+
+
+class StageTimer:
+    """
+    Wall time, CPU time and row counts per pipeline stage.
+
+    Args:
+        profile_stage: name (or nested path) of the one stage to run under
+            cProfile; None disables profiling
+        profile_dir: where profile files are written
+        label: prefix for profile file names, e.g. the strategy name
+        trace_memory: record tracemalloc peaks, allocation sites and RSS per span
+        memory_budget: bytes of RSS growth allowed; the next span to start or
+            end after it is exceeded raises MemoryBudgetExceeded
+
+    Call close() when the evaluation ends to stop tracing and the RSS sampler.
+    """
+
+    def __init__(self, profile_stage: str = None, profile_dir: str = PROFILE_DIR, label: str = "evaluation",
+                 trace_memory: bool = False, memory_budget: int = None):
+        self.spans = []
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self.label = label
+        self.profile_files = None
+        self.trace_memory = trace_memory
+        self.memory_budget = memory_budget
+        self.budget_error = None
+        self._path = []
+        self._open = []
+        self._started_tracing = False
+        self._sampler = None
+        self._lock = threading.Lock()
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if trace_memory or memory_budget is not None:
+            self._start_rss = current_rss()
+            if self._start_rss is not None:
+                self._stop = threading.Event()
+                self._sampler = threading.Thread(target=self._sample_rss, name=f"rss-{label}", daemon=True)
+                self._sampler.start()
+
+    def _sample_rss(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = current_rss()
+            with self._lock:
+                for frame in self._open:
+                    record = frame["record"]
+                    record["rss_peak_bytes"] = max(record.get("rss_peak_bytes") or 0, rss)
+                self._note_rss(rss)
+
+    def _note_rss(self, rss: int):
+        """Records the first budget overrun; called with self._lock held"""
+        growth = rss - self._start_rss
+        if self.memory_budget is not None and growth > self.memory_budget and self.budget_error is None:
+            stage = self._open[-1]["record"]["stage"] if self._open else "evaluation"
+            self.budget_error = (f"Memory budget of {self.memory_budget / 2**20:.1f} MB exceeded "
+                                 f"during {stage} stage (RSS grew by {growth / 2**20:.1f} MB)")
+
+    def _check_budget(self, raise_error: bool = True):
+        """Samples RSS once more and raises MemoryBudgetExceeded if the budget was exceeded"""
+        if self.memory_budget is None or self._sampler is None:
+            return
+        with self._lock:
+            self._note_rss(current_rss())
+        if raise_error and self.budget_error is not None:
+            raise MemoryBudgetExceeded(self.budget_error)
+
+    def _open_memory(self, record: dict) -> dict:
+        frame = {"record": record}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._open:
+                # Resetting the peak for this span must not lose the enclosing span's peak so far
+                self._open[-1]["peak"] = max(self._open[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame.update(start=current, peak=current, snapshot=tracemalloc.take_snapshot())
+        if self._sampler is not None:
+            record["rss_start_bytes"] = record["rss_peak_bytes"] = current_rss()
+        with self._lock:
+            self._open.append(frame)
+        return frame
+
+    def _close_memory(self, frame: dict):
+        with self._lock:
+            self._open.pop()
+        record = frame["record"]
+        if self.trace_memory:
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            record["peak_traced_bytes"] = peak - frame["start"]
+            record["top_allocations"] = _allocation_sites(frame["snapshot"], tracemalloc.take_snapshot(), TOP_ALLOCATION_SITES)
+            if self._open:
+                self._open[-1]["peak"] = max(self._open[-1]["peak"], peak)
+        if self._sampler is not None:
+            record["rss_end_bytes"] = current_rss()
+            record["rss_peak_bytes"] = max(record["rss_peak_bytes"], record["rss_end_bytes"])
+
+    def close(self):
+        """Stops the RSS sampler and any tracing this timer started"""
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        Times the enclosed block as one stage. Yields the span's record, so the
+        block can fill in "rows" (or any other detail) before it ends.
+        """
+        self._check_budget()
+        self._path.append(name)
+        record = {"stage": "/".join(self._path), "rows": None}
+        self.spans.append(record)
+        memory = self._open_memory(record) if self._sampler is not None or self.trace_memory else None
+        profiler = None
+        if self.profile_stage is not None and record["stage"] == self.profile_stage and self.profile_files is None:
+            profiler = cProfile.Profile()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = time.process_time() - cpu_start
+            # Sampled while the span is open so an overrun is attributed to it; raised once it is closed
+            self._check_budget(raise_error=False)
+            if memory is not None:
+                self._close_memory(memory)
+            self._path.pop()
+            if profiler is not None:
+                base_path = os.path.join(self.profile_dir, f"{self.label}_{record['stage'].replace('/', '_')}")
+                self.profile_files = write_profile(profiler, base_path)
+                record["profile"] = self.profile_files
+            self._check_budget()
+
+    def summary(self) -> str:
+        """One line per span, in the order the spans started"""
+        lines = []
+        for record in self.spans:
+            indent = "  " * record["stage"].count("/")
+            rows = f", {record['rows']} rows" if record.get("rows") is not None else ""
+            cached = " (cached)" if record.get("cached") else ""
+            memory = ""
+            if record.get("peak_traced_bytes") is not None:
+                memory += f", peak {record['peak_traced_bytes'] / 2**20:.1f} MB allocated"
+            if record.get("rss_peak_bytes") is not None:
+                memory += f", peak RSS {record['rss_peak_bytes'] / 2**20:.0f} MB"
+            lines.append(f"{indent}{record['stage']}: {record['wall_seconds']:.3f}s wall, "
+                         f"{record['cpu_seconds']:.3f}s CPU{rows}{memory}{cached}")
+        return "\n".join(lines)
@@ -0,0 +1,123 @@
+import json
+import numpy as np
+import pandas as pd
+
+EVENT_ENTRY = 1
+EVENT_EXIT = -1
+EVENT_NAMES = {EVENT_ENTRY: 'ENTRY', EVENT_EXIT: 'EXIT'}
+
+TRACE_DTYPE = np.dtype([
+    ('bar', np.int64),
+    ('timestamp', np.int64),      # nanoseconds since epoch
+    ('event', np.int8),           # EVENT_ENTRY or EVENT_EXIT
+    ('price', np.float64),
+    ('capital', np.float64),      # capital after the event's fees
+    ('trade_return', np.float64), # NaN for entries
+])
+
+
+class TraceRecorder:
+    """
+    Bounded ring buffer of numeric entry/exit records for TradeSimulator.
+
+    Pass an instance as TradeSimulator(trace=...) to enable tracing; nothing
+    is recorded or formatted otherwise. Once capacity records have been
+    written the oldest ones are overwritten, so memory stays fixed no matter
+    how long a sweep runs.
+    """
+
+    def __init__(self, capacity: int = 65536):
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=TRACE_DTYPE)
+        self._written = 0
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """Number of records overwritten because the buffer was full."""
+        return max(self._written - self.capacity, 0)
+
+    def clear(self):
+        self._written = 0
+
+    def record(self, bar: int, timestamp, event: int, price: float, capital: float, trade_return: float = np.nan):
+        """Appends a single event."""
+        slot = self._buffer[self._written % self.capacity]
+        slot['bar'] = bar
+        slot['timestamp'] = _to_epoch_ns(timestamp)
+        slot['event'] = event
+        slot['price'] = price
+        slot['capital'] = capital
+        slot['trade_return'] = trade_return
+        self._written += 1
+
+    def record_many(self, bar, timestamp, event, price, capital, trade_return):
+        """Appends equally long arrays of events in one bulk copy."""
+        bar = np.asarray(bar)
+        count = len(bar)
+        if count == 0:
+            return
+        records = np.empty(count, dtype=TRACE_DTYPE)
+        records['bar'] = bar
+        records['timestamp'] = _to_epoch_ns(timestamp)
+        records['event'] = event
+        records['price'] = price
+        records['capital'] = capital
+        records['trade_return'] = trade_return
+
+        # Only the newest capacity records can survive the write
+        skipped = max(count - self.capacity, 0)
+        records = records[skipped:]
+        self._written += skipped
+        slots = (self._written + np.arange(len(records))) % self.capacity
+        self._buffer[slots] = records
+        self._written += len(records)
+
+    def records(self) -> np.ndarray:
+        """Returns the retained records, oldest first, as a structured array."""
+        if self._written <= self.capacity:
+            return self._buffer[:self._written].copy()
+        start = self._written % self.capacity
+        return np.concatenate((self._buffer[start:], self._buffer[:start]))
+
+    def to_frame(self) -> pd.DataFrame:
+        records = self.records()
+        return pd.DataFrame({
+            'bar': records['bar'],
+            'timestamp': pd.to_datetime(records['timestamp'], unit='ns'),
+            'event': pd.Series(records['event']).map(EVENT_NAMES).to_numpy(),
+            'price': records['price'],
+            'capital': records['capital'],
+            'trade_return': records['trade_return'],
+        })
+
+    def dump_parquet(self, path: str):
+        self.to_frame().to_parquet(path, index=False)
+
+    def dump_jsonl(self, path: str):
+        frame = self.to_frame()
+        frame['timestamp'] = frame['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(path, 'w') as f:
+            for row in frame.itertuples(index=False):
+                record = {
+                    'bar': int(row.bar),
+                    'timestamp': row.timestamp,
+                    'event': row.event,
+                }
+                for key in ('price', 'capital', 'trade_return'):
+                    value = float(getattr(row, key))
+                    record[key] = None if np.isnan(value) else value
+                f.write(json.dumps(record) + '\n')
+
+
+def _to_epoch_ns(timestamp):
+    """Converts timestamps (scalar or array) to int64 nanoseconds since epoch."""
+    if isinstance(timestamp, np.ndarray) and timestamp.dtype.kind == 'M':
+        return timestamp.astype('datetime64[ns]').view(np.int64)
+    if np.ndim(timestamp) == 0:
+        return pd.Timestamp(timestamp).value
+    return pd.to_datetime(timestamp).asi8
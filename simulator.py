@@ -1,32 +1,285 @@
 import pandas as pd
+import numpy as np
 import logging
+from sim_trace import EVENT_ENTRY, EVENT_EXIT
 
 logger = logging.getLogger(__name__)
 
+ENGINES = ('vectorized', 'loop')
+
+# Integer codes used by the array engines for the 'signal' column
+SIGNAL_CODES = {'HOLD': 0, 'BUY': 1, 'SELL': -1}
+
+
+def encode_signals(signals) -> np.ndarray:
+    """
+    Converts 'BUY'/'SELL'/'HOLD' strings into int8 codes (1 / -1 / 0).
+
+    Accepts a Series, list or array of any shape; anything other than
+    'BUY' or 'SELL' is treated as HOLD.
+    """
+    values = np.asarray(signals)
+    if values.dtype.kind in 'iub':
+        return values.astype(np.int8, copy=False)
+    codes = np.zeros(values.shape, dtype=np.int8)
+    codes[values == 'BUY'] = SIGNAL_CODES['BUY']
+    codes[values == 'SELL'] = SIGNAL_CODES['SELL']
+    return codes
+
+
+def resolve_positions(codes: np.ndarray) -> np.ndarray:
+    """
+    Resolves the long-only BUY/SELL state machine without a Python loop.
+
+    After bar i the strategy is long exactly when the most recent non-HOLD
+    signal up to and including bar i was a BUY: a BUY while long and a SELL
+    while flat are no-ops, so only the last event matters. Works along
+    axis 0, so a (bars x variants) matrix resolves every column at once.
+
+    Returns:
+    - bool array of the same shape, True where a long position is held after the bar
+    """
+    codes = np.asarray(codes)
+    bar_index = np.arange(codes.shape[0]).reshape((-1,) + (1,) * (codes.ndim - 1))
+    last_event = np.where(codes != 0, bar_index, -1)
+    np.maximum.accumulate(last_event, axis=0, out=last_event)
+    event_code = np.take_along_axis(codes, np.maximum(last_event, 0), axis=0)
+    return (last_event >= 0) & (event_code == SIGNAL_CODES['BUY'])
+
+
+
+def _simulate_matrix(close: np.ndarray, codes: np.ndarray, initial_capital: float, fee_pct: float) -> dict:
+    """
+    Runs the long-only simulation for every column of a (bars x variants) code matrix.
+
+    close is either shared by all variants (shape (bars,)) or given per
+    variant (shape (bars, variants)). Fees and compounding follow the loop
+    engine: entry fee, PnL on the remaining capital, exit fee, and a forced
+    exit on the last bar falling back to the entry price when that close
+    is NaN.
+
+    Returns:
+    - dict of (bars x variants) arrays: 'position', 'entry_mask', 'exit_mask',
+      'entry_bar', 'entry_price', 'exit_price', 'trade_return' and 'capital'
+      (realized capital after each bar's fills)
+    """
+    codes = np.asarray(codes)
+    n_bars, n_variants = codes.shape
+    close = np.asarray(close, dtype=np.float64).reshape(n_bars, -1)
+    columns = np.arange(n_variants) if close.shape[1] > 1 else np.zeros(n_variants, dtype=np.intp)
+
+    position = resolve_positions(codes)
+    held_before = np.zeros_like(position)
+    held_before[1:] = position[:-1]
+    entry_mask = position & ~held_before
+    exit_mask = held_before & ~position
+    # Do a final Sell if still Target Coin will be Held
+    final_exit = position[-1].copy()
+    exit_mask[-1] |= final_exit
+
+    entry_bar = np.where(entry_mask, np.arange(n_bars)[:, None], -1)
+    np.maximum.accumulate(entry_bar, axis=0, out=entry_bar)
+    entry_price = close[np.maximum(entry_bar, 0), columns]
+    exit_price = np.broadcast_to(close, (n_bars, n_variants)).copy()
+    exit_price[-1] = np.where(final_exit & np.isnan(exit_price[-1]), entry_price[-1], exit_price[-1])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trade_return = (exit_price - entry_price) / entry_price
+
+    growth = np.where(entry_mask, 1 - fee_pct, 1.0)  # entry fee
+    growth *= np.where(exit_mask, (1 + trade_return) * (1 - fee_pct), 1.0)  # PnL and exit fee
+    capital = initial_capital * np.cumprod(growth, axis=0)
+
+    return {
+        'position': position,
+        'entry_mask': entry_mask,
+        'exit_mask': exit_mask,
+        'final_exit': final_exit,
+        'entry_bar': entry_bar,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'trade_return': trade_return,
+        'capital': capital,
+    }
+
+
+def _mark_prices(close: np.ndarray, n_bars: int) -> np.ndarray:
+    """(bars x columns) last non-NaN close up to each bar; NaN before the first valid close"""
+    close = np.asarray(close, dtype=np.float64).reshape(n_bars, -1)
+    last_valid = np.where(np.isnan(close), -1, np.arange(n_bars)[:, None])
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    mark_price = np.take_along_axis(close, np.maximum(last_valid, 0), axis=0)
+    mark_price[last_valid < 0] = np.nan
+    return mark_price
+
+
+def _mark_to_market(close: np.ndarray, sim: dict) -> dict:
+    """
+    Per-bar equity of a _simulate_matrix result, valued at the bar close.
+
+    Open positions are marked at the last non-NaN close before exit fees;
+    the bar that force-closes the final position is already flat.
+
+    Returns:
+    - dict of (bars x variants) arrays: 'equity' (float64), 'position' (int8,
+      1 while long) and 'exposure' (float64 notional value of the open position)
+    """
+    mark_price = _mark_prices(close, sim['capital'].shape[0])
+
+    held = sim['position'].copy()
+    held[-1] &= ~sim['final_exit']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        equity = np.where(held, sim['capital'] * mark_price / sim['entry_price'], sim['capital'])
+    return {
+        'equity': equity,
+        'position': held.astype(np.int8),
+        'exposure': np.where(held, equity, 0.0),
+    }
+
+
 class TradeSimulator:
     def __init__(self, 
                  initial_capital: float = 1000.0,
                  fee_pct: float = 0.001,  # 0.1% per trade (entry + exit = 0.2% total)
-                 compound: bool = True):
+                 compound: bool = True,
+                 engine: str = 'vectorized',
+                 trace=None):  # optional sim_trace.TraceRecorder
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}. Valid engines are: {ENGINES}")
         self.initial_capital = initial_capital
         self.fee_pct = fee_pct
         self.compound = compound
+        self.engine = engine
+        self.trace = trace
+        self.reset()
+
+    def reset(self):
+        """Clears the streaming state used by step() back to a flat account."""
+        self.capital = self.initial_capital
+        self.position = None
+        self.entry_price = None
+        self.last_timestamp = None
+        self.last_close = None
+        self.bars_processed = 0
+
+    def step(self, timestamp, close: float, signal: str):
+        """
+        Processes a single new candle and updates the streaming state in O(1).
+
+        Inputs:
+        - timestamp: timestamp of the candle
+        - close: close price of the candle
+        - signal: 'BUY', 'SELL' or 'HOLD' for this candle
+
+        Returns:
+        - the closed trade as a tradelog record (dict) when the candle exits a
+          position, otherwise None
+        """
+        if signal not in SIGNAL_CODES:
+            raise ValueError(f"Invalid signal value: {signal}. Valid values are: {set(SIGNAL_CODES)}")
+
+        trade = None
+        if signal == 'BUY' and self.position is None:
+            # Enter long
+            self.entry_price = close
+            self.position = 'long'
+            self.capital *= (1 - self.fee_pct)  # entry fee
+            if self.trace is not None:
+                self.trace.record(self.bars_processed, timestamp, EVENT_ENTRY, close, self.capital)
+
+        elif signal == 'SELL' and self.position == 'long':
+            trade = self._exit_position(self.bars_processed, timestamp, close)
+
+        self.last_timestamp = timestamp
+        self.last_close = close
+        self.bars_processed += 1
+        return trade
+
+    def close_position(self):
+        """
+        Exits an open position at the last processed candle, as run() does at the
+        end of a history. Falls back to the entry price when that close is NaN.
+
+        Returns:
+        - the closed trade record (dict), or None when no position is open
+        """
+        if self.position != 'long':
+            return None
+
+        exit_price = self.last_close
+        if pd.isna(exit_price):
+            logger.warning("Final candle close price is NaN, using entry price as exit price")
+            exit_price = self.entry_price
+        return self._exit_position(self.bars_processed - 1, self.last_timestamp, exit_price)
+
+    def _exit_position(self, bar: int, timestamp, exit_price: float) -> dict:
+        trade_return = (exit_price - self.entry_price) / self.entry_price
+        pnl = self.capital * trade_return
+
+        self.capital += pnl
+        self.capital *= (1 - self.fee_pct)  # exit fee
+        if self.trace is not None:
+            self.trace.record(bar, timestamp, EVENT_EXIT, exit_price, self.capital, trade_return)
+
+        trade = {
+            'timestamp': timestamp,
+            'entry_price': self.entry_price,
+            'exit_price': exit_price,
+            'PnL': round(trade_return, 6),   # in decimal, e.g. 0.05 = +5%
+            'capital': round(self.capital, 2)
+        }
+        self.entry_price = None
+        self.position = None
+        return trade
+
+    def snapshot(self) -> dict:
+        """Returns the streaming state as a JSON-serializable dict for restore()."""
+        return {
+            'initial_capital': self.initial_capital,
+            'fee_pct': self.fee_pct,
+            'capital': float(self.capital),
+            'position': self.position,
+            'entry_price': None if self.entry_price is None else float(self.entry_price),
+            'last_timestamp': None if self.last_timestamp is None else pd.Timestamp(self.last_timestamp).isoformat(),
+            'last_close': None if self.last_close is None else float(self.last_close),
+            'bars_processed': self.bars_processed,
+        }
 
-    def run(self, candles: pd.DataFrame, signals: pd.DataFrame) -> pd.DataFrame:
+    def restore(self, state: dict):
+        """Resumes streaming from a dict produced by snapshot()."""
+        if state['fee_pct'] != self.fee_pct or state['initial_capital'] != self.initial_capital:
+            raise ValueError(
+                f"Snapshot was taken with initial_capital={state['initial_capital']}, fee_pct={state['fee_pct']}; "
+                f"simulator has initial_capital={self.initial_capital}, fee_pct={self.fee_pct}"
+            )
+        self.capital = state['capital']
+        self.position = state['position']
+        self.entry_price = state['entry_price']
+        self.last_timestamp = None if state['last_timestamp'] is None else pd.Timestamp(state['last_timestamp'])
+        self.last_close = state['last_close']
+        self.bars_processed = state['bars_processed']
+
+    def run(self, candles: pd.DataFrame, signals: pd.DataFrame, record_equity: bool = False):
         """
         Simulates trade execution based on signals.
 
         Inputs:
         - candles: DataFrame with 'timestamp' and 'close'
         - signals: DataFrame with 'timestamp' and 'signal' ('BUY', 'SELL', 'HOLD')
+        - record_equity: also return the per-bar mark-to-market equity curve
 
         Returns:
         - tradelog: DataFrame with each trade's entry, exit, PnL, and resulting capital
+        - equity_curve (only with record_equity=True): dict of per-bar NumPy arrays
+          'timestamp', 'equity' (float64), 'position' (int8, 1 while long) and
+          'exposure' (float64 value of the open position)
+
+        The 'vectorized' engine (default) resolves positions and compounding
+        with NumPy array operations; the 'loop' engine walks the candles one
+        by one and is kept as the reference implementation.
         """
-        logger.info(f"Starting trade simulation with {len(candles)} candles and {len(signals)} signals")
-        logger.info(f"First few signals:\n{signals.head()}")
-        logger.info(f"Last few signals:\n{signals.tail()}")
-        
+        logger.debug("Starting trade simulation with %d candles and %d signals", len(candles), len(signals))
+
         # Critical validations using assert
         assert 'close' in candles.columns, f"Missing 'close' column in candles. Available columns: {candles.columns.tolist()}"
         assert 'signal' in signals.columns, f"Missing 'signal' column in signals. Available columns: {signals.columns.tolist()}"
@@ -38,26 +291,159 @@ class TradeSimulator:
         if invalid_signals:
             raise ValueError(f"Invalid signal values found: {invalid_signals}. Valid values are: {valid_signals}")
 
+        if self.engine == 'loop':
+            tradelog, equity_curve = self._run_loop(candles, signals, record_equity)
+        else:
+            tradelog, equity_curve = self._run_vectorized(candles, signals, record_equity)
+
+        logger.debug("Simulation complete. Number of trades executed: %d", len(tradelog))
+        if tradelog.empty:
+            logger.warning("No trades were executed during the simulation")
+        
+        if record_equity:
+            return tradelog, equity_curve
+        return tradelog
+
+    def _run_vectorized(self, candles: pd.DataFrame, signals: pd.DataFrame, record_equity: bool = False):
+        """Array implementation of the loop engine; produces the same tradelog."""
+        close = candles['close'].to_numpy(dtype=np.float64)
+        timestamps = candles['timestamp'].to_numpy()
+        codes = encode_signals(signals['signal'].to_numpy())[:, None]
+        if len(close) == 0:
+            # Nothing to simulate; matches the loop engine on empty input
+            equity_curve = None
+            if record_equity:
+                equity_curve = {'timestamp': timestamps, 'equity': np.empty(0, dtype=np.float64),
+                                'position': np.empty(0, dtype=np.int8), 'exposure': np.empty(0, dtype=np.float64)}
+            return pd.DataFrame([]), equity_curve
+        sim = _simulate_matrix(close, codes, self.initial_capital, self.fee_pct)
+
+        equity_curve = None
+        if record_equity:
+            marked = _mark_to_market(close, sim)
+            equity_curve = {'timestamp': timestamps}
+            equity_curve.update({key: values[:, 0] for key, values in marked.items()})
+
+        if self.trace is not None:
+            self._trace_matrix(timestamps, sim)
+
+        exits = np.flatnonzero(sim['exit_mask'][:, 0])
+        if len(exits) == 0:
+            return pd.DataFrame([]), equity_curve
+        if sim['final_exit'][0] and np.isnan(close[-1]):
+            logger.warning("Final candle close price is NaN, using entry price as exit price")
+
+        tradelog = pd.DataFrame({
+            'timestamp': timestamps[exits],
+            'entry_price': sim['entry_price'][exits, 0],
+            'exit_price': sim['exit_price'][exits, 0],
+            'PnL': np.round(sim['trade_return'][exits, 0], 6),   # in decimal, e.g. 0.05 = +5%
+            'capital': np.round(sim['capital'][exits, 0], 2)
+        })
+        return tradelog, equity_curve
+
+    def _trace_matrix(self, timestamps: np.ndarray, sim: dict):
+        """Bulk-records the entries and exits of a single-variant _simulate_matrix result."""
+        entries = np.flatnonzero(sim['entry_mask'][:, 0])
+        exits = np.flatnonzero(sim['exit_mask'][:, 0])
+        bars = np.concatenate((entries, exits))
+        # Stable sort keeps an entry ahead of a forced exit on the same last bar
+        order = np.argsort(bars, kind='stable')
+        capital = sim['capital'][:, 0]
+        # Capital before the entry bar less the entry fee; capital[entry] itself
+        # already includes a forced exit when the entry is on the last bar
+        capital_before = np.where(entries > 0, capital[np.maximum(entries - 1, 0)], self.initial_capital)
+        entry_capital = capital_before * (1 - self.fee_pct)
+        self.trace.record_many(
+            bar=bars[order],
+            timestamp=timestamps[bars[order]],
+            event=np.concatenate((np.full(len(entries), EVENT_ENTRY), np.full(len(exits), EVENT_EXIT)))[order],
+            price=np.concatenate((sim['entry_price'][entries, 0], sim['exit_price'][exits, 0]))[order],
+            capital=np.concatenate((entry_capital, capital[exits]))[order],
+            trade_return=np.concatenate((np.full(len(entries), np.nan), sim['trade_return'][exits, 0]))[order],
+        )
+
+    def run_batch(self, close, signal_matrix, timestamps=None, chunk_size: int = 256) -> dict:
+        """
+        Simulates many signal variants against the same close prices in one pass.
+
+        Inputs:
+        - close: 1D array/Series of close prices (one per bar)
+        - signal_matrix: (bars x variants) array of 'BUY'/'SELL'/'HOLD' strings
+          or the int8 codes from encode_signals
+        - timestamps: optional 1D array of bar timestamps, used to label trades
+        - chunk_size: number of variants simulated together, bounding memory
+
+        Returns:
+        - dict with per-variant 'final_capital' and 'trade_count', plus a compact
+          tradelog of flat arrays ('entry_bar', 'exit_bar', 'entry_price',
+          'exit_price', 'PnL', 'capital' and optionally 'timestamp') ordered by
+          variant; the trades of variant j are rows
+          trade_offsets[j]:trade_offsets[j + 1]
+        """
+        close = np.asarray(close, dtype=np.float64)
+        codes = encode_signals(signal_matrix)
+        if codes.ndim == 1:
+            codes = codes[:, None]
+        assert codes.shape[0] == len(close), f"Mismatch in data length: close={len(close)}, signals={codes.shape[0]}"
+
+        n_variants = codes.shape[1]
+        trade_count = np.zeros(n_variants, dtype=np.int64)
+        trades = {key: [] for key in ('variant', 'entry_bar', 'exit_bar', 'entry_price', 'exit_price', 'PnL', 'capital')}
+
+        # Without bars there is nothing to simulate and every variant keeps its capital
+        for start in range(0, n_variants if len(close) else 0, chunk_size):
+            stop = min(start + chunk_size, n_variants)
+            sim = _simulate_matrix(close, codes[:, start:stop], self.initial_capital, self.fee_pct)
+            # Transposed so trades come out grouped by variant, then by bar
+            variant, exit_bar = np.nonzero(sim['exit_mask'].T)
+            trade_count[start:stop] = np.bincount(variant, minlength=stop - start)
+            trades['variant'].append(variant + start)
+            trades['entry_bar'].append(sim['entry_bar'][exit_bar, variant])
+            trades['exit_bar'].append(exit_bar)
+            trades['entry_price'].append(sim['entry_price'][exit_bar, variant])
+            trades['exit_price'].append(sim['exit_price'][exit_bar, variant])
+            trades['PnL'].append(np.round(sim['trade_return'][exit_bar, variant], 6))
+            trades['capital'].append(np.round(sim['capital'][exit_bar, variant], 2))
+
+        result = {key: np.concatenate(parts) if parts else np.empty(0) for key, parts in trades.items()}
+        result['trade_offsets'] = np.concatenate(([0], np.cumsum(trade_count)))
+        result['trade_count'] = trade_count
+
+        final_capital = np.full(n_variants, self.initial_capital, dtype=np.float64)
+        traded = trade_count > 0
+        final_capital[traded] = result['capital'][result['trade_offsets'][1:][traded] - 1]
+        result['final_capital'] = final_capital
+
+        if timestamps is not None:
+            result['timestamp'] = np.asarray(timestamps)[result['exit_bar']]
+        return result
+
+    def _run_loop(self, candles: pd.DataFrame, signals: pd.DataFrame, record_equity: bool = False):
+        """Reference engine: walks the candles one bar at a time."""
         capital = self.initial_capital
         entry_price = None
         position = None
         tradelog = []
 
-        logger.info(f"Initial capital: {capital}")
+        if record_equity:
+            equity = np.empty(len(candles), dtype=np.float64)
+            held = np.zeros(len(candles), dtype=np.int8)
+            exposure = np.zeros(len(candles), dtype=np.float64)
+            mark_price = np.nan
 
         for i in range(len(candles)):
             timestamp = candles.iloc[i]['timestamp']
             close_price = candles.iloc[i]['close']
             signal = signals.iloc[i]['signal'].upper()
 
-            logger.debug(f"Processing candle {i}: timestamp={timestamp}, close={close_price}, signal={signal}, position={position}")
-
             if signal == 'BUY' and position is None:
                 # Enter long
                 entry_price = close_price
                 position = 'long'
                 capital *= (1 - self.fee_pct)  # entry fee
-                logger.info(f"Entering LONG position at price {entry_price}, capital after fee: {capital}")
+                if self.trace is not None:
+                    self.trace.record(i, timestamp, EVENT_ENTRY, entry_price, capital)
 
             elif signal == 'SELL' and position == 'long':
                 # Exit long
@@ -68,7 +454,8 @@ class TradeSimulator:
                 capital += pnl
                 capital *= (1 - self.fee_pct)  # exit fee
 
-                logger.info(f"Exiting LONG position: entry={entry_price}, exit={exit_price}, return={trade_return:.4f}, PnL={pnl:.2f}, final capital={capital:.2f}")
+                if self.trace is not None:
+                    self.trace.record(i, timestamp, EVENT_EXIT, exit_price, capital, trade_return)
 
                 tradelog.append({
                     'timestamp': timestamp,
@@ -83,33 +470,32 @@ class TradeSimulator:
 
             # HOLD or SELL while no open position → do nothing
 
-        logger.info(f"After main loop - Position: {position}, Entry price: {entry_price}, Capital: {capital}")
-        
+            if record_equity:
+                if not pd.isna(close_price):
+                    mark_price = close_price
+                if position == 'long':
+                    equity[i] = capital * mark_price / entry_price
+                    held[i] = 1
+                    exposure[i] = equity[i]
+                else:
+                    equity[i] = capital
+
         if position == 'long':
             #Do a final Sell if still Target Coin will be Held 
             last_candle = candles.iloc[-1]
-            logger.info(f"Final candle data:\n{last_candle}")
-            
             exit_price = last_candle['close']
-            logger.info(f"Final candle close price: {exit_price}")
             
             if pd.isna(exit_price):
                 logger.warning("Final candle close price is NaN, using entry price as exit price")
                 exit_price = entry_price
-                logger.info(f"Using entry price as exit price: {exit_price}")
             
-            logger.info(f"Calculating trade return: entry={entry_price}, exit={exit_price}")
             trade_return = (exit_price - entry_price) / entry_price
-            logger.info(f"Trade return: {trade_return}")
-            
             pnl = capital * trade_return
-            logger.info(f"PnL: {pnl}")
 
             capital += pnl
             capital *= (1 - self.fee_pct)  # exit fee
-            logger.info(f"Final capital after fees: {capital}")
-
-            logger.info(f"Final position close: entry={entry_price}, exit={exit_price}, return={trade_return:.4f}, PnL={pnl:.2f}, final capital={capital:.2f}")
+            if self.trace is not None:
+                self.trace.record(len(candles) - 1, last_candle['timestamp'], EVENT_EXIT, exit_price, capital, trade_return)
 
             tradelog.append({
                 'timestamp': last_candle['timestamp'],
@@ -122,12 +508,17 @@ class TradeSimulator:
             entry_price = None
             position = None
 
-        logger.info(f"Simulation complete. Final capital: {capital}")
-        logger.info(f"Number of trades executed: {len(tradelog)}")
-        if tradelog:
-            logger.info(f"Last trade in tradelog:\n{pd.DataFrame(tradelog).iloc[-1]}")
-        
-        if not tradelog:
-            logger.warning("No trades were executed during the simulation")
-        
-        return pd.DataFrame(tradelog)
+            if record_equity:
+                equity[-1] = capital
+                held[-1] = 0
+                exposure[-1] = 0.0
+
+        equity_curve = None
+        if record_equity:
+            equity_curve = {
+                'timestamp': candles['timestamp'].to_numpy(),
+                'equity': equity,
+                'position': held,
+                'exposure': exposure,
+            }
+        return pd.DataFrame(tradelog), equity_curve
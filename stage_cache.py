@@ -0,0 +1,144 @@
+"""
+Content-addressed on-disk cache for evaluation pipeline stages.
+
+Each entry is the pickled output of one stage, stored under the SHA-256 of
+the stage name and its key parts (strategy source hash, data fingerprint,
+stage parameters, and the keys of the stages it consumed). Entries are
+never invalidated in place: a changed input simply hashes to a new key, and
+the least recently used entries are evicted once the cache exceeds its size
+budget.
+"""
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+
+STAGE_CACHE_DIR = "candle_data/stage_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str) -> dict:
+    """Cheap identity of a data file: path, size and modification time"""
+    if not os.path.exists(path):
+        return {"path": os.path.abspath(path), "missing": True}
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+class StageCache:
+    def __init__(self, root: str = STAGE_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, stage: str, parts: dict) -> str:
+        payload = json.dumps({"stage": stage, "parts": parts}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.pkl")
+
+    def get(self, key: str):
+        """
+        Returns:
+            (True, value) on a hit, (False, None) on a miss
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Unreadable entry (e.g. written by an older version); recompute it
+            os.remove(path)
+            return False, None
+        # Bump mtime so eviction sees this entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since it was read; the value is still good
+            pass
+        return True, value
+
+    def put(self, key: str, value):
+        path = self._entry_path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".pkl", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def memo(self, stage: str, parts: dict, compute):
+        """
+        Returns the cached output of a stage, computing and storing it on a miss.
+
+        Args:
+            stage: stage name, e.g. 'signals'
+            parts: JSON-serializable dict of everything the output depends on
+            compute: zero-argument callable producing the stage output
+
+        Returns:
+            (value, key); pass key into the parts of downstream stages
+        """
+        key = self.key(stage, parts)
+        hit, value = self.get(key)
+        if hit:
+            self.hits += 1
+            return value, key
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value, key
+
+    def entries(self) -> list:
+        """(mtime_ns, size, path) of every entry, least recently used first"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".pkl") and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
@@ -0,0 +1,75 @@
+import os
+import re
+import sys
+import hashlib
+import threading
+import importlib.util
+
+
+class StrategyRegistry:
+    """
+    Loaded strategy modules keyed by file path.
+
+    A strategy file is executed once and its module reused until the file
+    changes: a different mtime or size triggers a re-hash, and the module is
+    re-executed only when the contents actually differ. Every path gets its
+    own module name (registered in sys.modules), so strategies loaded back to
+    back or from several threads never replace each other.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def module_name(path: str) -> str:
+        """Unique, importable module name for a strategy file"""
+        abs_path = os.path.abspath(path)
+        stem = re.sub(r"\W", "_", os.path.splitext(os.path.basename(abs_path))[0])
+        path_hash = hashlib.sha1(abs_path.encode()).hexdigest()[:8]
+        return f"strategy_{stem}_{path_hash}"
+
+    def _entry(self, path: str) -> dict:
+        abs_path = os.path.abspath(path)
+        stat = os.stat(abs_path)
+        with self._lock:
+            entry = self._entries.get(abs_path)
+            if entry is not None and (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns, stat.st_size):
+                return entry
+
+            with open(abs_path, "rb") as f:
+                source = f.read()
+            digest = hashlib.sha256(source).hexdigest()
+            if entry is None or entry["digest"] != digest:
+                entry = {"digest": digest, "module": self._execute(abs_path)}
+                self._entries[abs_path] = entry
+            entry["mtime_ns"], entry["size"] = stat.st_mtime_ns, stat.st_size
+            return entry
+
+    def _execute(self, abs_path: str):
+        name = self.module_name(abs_path)
+        spec = importlib.util.spec_from_file_location(name, abs_path)
+        module = importlib.util.module_from_spec(spec)
+        previous = sys.modules.get(name)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            if previous is not None:
+                sys.modules[name] = previous
+            else:
+                del sys.modules[name]
+            raise
+        return module
+
+    def load(self, path: str):
+        """The strategy module for path, executing the file only if it changed"""
+        return self._entry(path)["module"]
+
+    def digest(self, path: str) -> str:
+        """SHA-256 of the source the loaded module was executed from"""
+        return self._entry(path)["digest"]
+
+    def forget(self, path: str):
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
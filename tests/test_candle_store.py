@@ -0,0 +1,51 @@
+import os
+import numpy as np
+import pandas as pd
+from candle_store import CURRENT_FILE, CandleStore
+
+
+def candles(n_rows: int, offset: float = 0.0) -> pd.DataFrame:
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=n_rows, freq="h"),
+        "close": np.arange(n_rows, dtype=np.float64) + offset,
+        "volume": np.ones(n_rows, dtype=np.float32),
+    })
+
+
+def test_write_and_load_round_trip(tmp_path):
+    store = CandleStore(str(tmp_path))
+    df = candles(50)
+    store.write("ldo", df, source={"path": "ldo_1h.parquet"})
+
+    assert store.names() == ["ldo"]
+    assert store.meta("ldo")["source"] == {"path": "ldo_1h.parquet"}
+    pd.testing.assert_frame_equal(store.load("ldo"), df)
+    pd.testing.assert_frame_equal(store.load("ldo", ["close"]), df[["close"]])
+
+
+def test_rewrites_keep_only_current_and_replaced_versions(tmp_path):
+    store = CandleStore(str(tmp_path))
+    for i in range(4):
+        store.write("ldo", candles(10, offset=i))
+
+    versions = [entry for entry in os.listdir(tmp_path / "ldo") if entry != CURRENT_FILE]
+    assert len(versions) == 2
+    assert store.load("ldo")["close"].iloc[0] == 3
+
+
+def test_load_retries_when_a_rewrite_retires_its_version(tmp_path, monkeypatch):
+    store = CandleStore(str(tmp_path))
+    store.write("ldo", candles(10))
+    original_load = np.load
+    rewrites = []
+
+    def load_during_rewrites(path, *args, **kwargs):
+        if not rewrites:
+            # Two writes while this reader is opening the first version retire it
+            rewrites.extend([1, 2])
+            for offset in rewrites:
+                store.write("ldo", candles(10, offset=offset))
+        return original_load(path, *args, **kwargs)
+
+    monkeypatch.setattr(np, "load", load_during_rewrites)
+    assert store.load("ldo")["close"].iloc[0] == 2
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+import data_fetcher
+from klines_stub import KlinesStubServer
+
+HOUR_MS = 60 * 60 * 1000
+
+
+def hourly_candles(n_bars: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1, n_bars))
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=n_bars, freq="h"),
+        "open": close, "high": close + 1, "low": close - 1, "close": close,
+        "volume": rng.uniform(1, 10, n_bars),
+    })
+
+
+def ms(timestamp) -> int:
+    return pd.Timestamp(timestamp).value // 10**6
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    """Stub endpoint serving 48 hourly LDO candles, with the cache directory under tmp_path"""
+    candles = hourly_candles(48)
+    monkeypatch.setattr(data_fetcher, "CACHE_DIR", str(tmp_path))
+    with KlinesStubServer({("LDOUSDT", "1h"): candles}) as server:
+        monkeypatch.setattr(data_fetcher, "KLINES_URL", server.url)
+        yield server, candles
+
+
+def test_refresh_fetches_only_the_tail(stub):
+    server, candles = stub
+    data_fetcher._atomic_to_parquet(candles.iloc[:30], data_fetcher._cache_path("LDO", "1h"))
+
+    refreshed = data_fetcher.refresh_target_data("LDO", "1h", end_time=ms(candles["timestamp"].iloc[-1]))
+
+    assert len(server.requests) == 1
+    assert int(server.requests[0]["startTime"]) == ms(candles["timestamp"].iloc[30])
+    pd.testing.assert_frame_equal(refreshed, candles, check_dtype=False)
+    pd.testing.assert_frame_equal(pd.read_parquet(data_fetcher._cache_path("LDO", "1h")), refreshed)
+
+
+def test_refresh_fills_empty_grid_rows(stub):
+    server, candles = stub
+    cached = candles.copy()
+    cached.loc[30:, ["open", "high", "low", "close", "volume"]] = np.nan
+    data_fetcher._atomic_to_parquet(cached, data_fetcher._cache_path("LDO", "1h"))
+
+    refreshed = data_fetcher.refresh_target_data("LDO", "1h", end_time=ms(candles["timestamp"].iloc[-1]))
+
+    assert int(server.requests[0]["startTime"]) == ms(candles["timestamp"].iloc[30])
+    assert len(refreshed) == len(candles)
+    np.testing.assert_allclose(refreshed["close"], candles["close"])
+
+
+def test_refresh_up_to_date_cache_makes_no_request(stub):
+    server, candles = stub
+    data_fetcher._atomic_to_parquet(candles, data_fetcher._cache_path("LDO", "1h"))
+
+    refreshed = data_fetcher.refresh_target_data("LDO", "1h", end_time=ms(candles["timestamp"].iloc[-1]) + HOUR_MS - 1)
+
+    assert server.requests == []
+    pd.testing.assert_frame_equal(refreshed, candles)
+
+
+@pytest.mark.parametrize("explicit_end", [False, True])
+def test_refresh_skips_the_forming_candle(tmp_path, monkeypatch, explicit_end):
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    candles = hourly_candles(48)
+    # The last served candle opened within the current hour and is still forming
+    candles["timestamp"] = pd.date_range(end=now.floor("h"), periods=48, freq="h")
+    monkeypatch.setattr(data_fetcher, "CACHE_DIR", str(tmp_path))
+    data_fetcher._atomic_to_parquet(candles.iloc[:30], data_fetcher._cache_path("LDO", "1h"))
+
+    with KlinesStubServer({("LDOUSDT", "1h"): candles}) as server:
+        monkeypatch.setattr(data_fetcher, "KLINES_URL", server.url)
+        end_time = ms(now) if explicit_end else None
+        refreshed = data_fetcher.refresh_target_data("LDO", "1h", end_time=end_time)
+
+    assert int(server.requests[0]["startTime"]) == ms(candles["timestamp"].iloc[30])
+    pd.testing.assert_frame_equal(refreshed, candles.iloc[:47], check_dtype=False)
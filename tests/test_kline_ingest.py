@@ -0,0 +1,20 @@
+import pandas as pd
+from kline_ingest import find_dump_files, ingest_dumps
+
+
+def write_dump(path, rows):
+    path.write_text("".join(
+        f"{open_time},{price},{price},{price},{price},100,{open_time + 3599999},0,0,0,0,0\n" for open_time, price in rows
+    ))
+
+
+def test_only_usdt_pairs_are_ingested(tmp_path):
+    write_dump(tmp_path / "LDOUSDT-1h-2025-01.csv", [(1735689600000, 1.05), (1735693200000, 1.10)])
+    write_dump(tmp_path / "LDOBTC-1h-2025-01.csv", [(1735689600000, 0.00001)])
+    write_dump(tmp_path / "ETHBTC-1h-2025-01.csv", [(1735689600000, 0.03)])
+
+    assert list(find_dump_files(str(tmp_path))) == [("LDO", "1h")]
+    outputs = ingest_dumps(str(tmp_path), output_dir=str(tmp_path / "out"))
+
+    candles = pd.read_parquet(outputs[("LDO", "1h")])
+    assert candles["close"].tolist() == [1.05, 1.10]
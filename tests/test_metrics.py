@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from metrics import compute_metrics, equity_metrics, pad_trades, trade_metrics
+from simulator import TradeSimulator
+
+
+def test_trade_metrics_by_hand():
+    pnl = np.array([0.10, -0.05, 0.02, -0.10])
+    capital = np.array([1100.0, 1045.0, 1065.9, 959.31])
+    metrics = trade_metrics(pnl, capital, 1000.0)
+
+    assert metrics["total_trades"] == 4
+    assert metrics["final_capital"] == 959.31
+    assert metrics["return_percentage"] == pytest.approx(-4.069)
+    assert metrics["max_drawdown_percentage"] == pytest.approx((1 - 959.31 / 1100) * 100)
+    assert metrics["win_rate"] == 50.0
+    assert metrics["avg_win"] == pytest.approx(0.06)
+    assert metrics["avg_loss"] == pytest.approx(-0.075)
+    assert metrics["profit_factor"] == pytest.approx(0.12 / 0.15)
+    assert metrics["sharpe_ratio"] == pytest.approx(pnl.mean() / pnl.std())
+    assert metrics["max_drawdown_duration_hours"] == 3
+
+
+def test_trade_metrics_without_trades():
+    metrics = trade_metrics(np.empty(0), np.empty(0), 1000.0)
+
+    assert metrics["total_trades"] == 0
+    assert metrics["final_capital"] == 1000.0
+    assert metrics["return_percentage"] == 0.0
+    assert np.isnan(metrics["max_drawdown_percentage"])
+
+
+def test_padded_batch_matches_single_series():
+    rng = np.random.default_rng(0)
+    counts = [5, 0, 1, 12, 3]
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    pnl = rng.normal(0.01, 0.05, offsets[-1])
+    capital = 1000 * np.cumprod(1 + pnl)
+    batch = trade_metrics(pad_trades(pnl, offsets), pad_trades(capital, offsets), 1000.0, trade_counts=counts)
+
+    for j in range(len(counts)):
+        single = trade_metrics(pnl[offsets[j]:offsets[j + 1]], capital[offsets[j]:offsets[j + 1]], 1000.0)
+        for name, value in single.items():
+            np.testing.assert_equal(batch[name][j], value, err_msg=name)
+
+
+def test_equity_metrics_batch_matches_single_series():
+    rng = np.random.default_rng(1)
+    equity = 1000 * np.cumprod(1 + rng.normal(0, 0.01, (4, 200)), axis=1)
+    timestamps = pd.date_range("2025-01-01", periods=200, freq="h").to_numpy()
+    batch = equity_metrics(equity, timestamps)
+
+    for j in range(len(equity)):
+        single = equity_metrics(equity[j], timestamps)
+        assert batch["bar_max_drawdown_percentage"][j] == single["bar_max_drawdown_percentage"]
+        assert batch["bar_sharpe_ratio"][j] == single["bar_sharpe_ratio"]
+
+
+def test_compute_metrics_from_simulator_run():
+    rng = np.random.default_rng(2)
+    timestamps = pd.date_range("2025-01-01", periods=300, freq="h")
+    candles = pd.DataFrame({"timestamp": timestamps, "close": 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 300)))})
+    signals = pd.DataFrame({"timestamp": timestamps, "signal": rng.choice(["BUY", "SELL", "HOLD"], 300, p=[0.1, 0.1, 0.8])})
+    tradelog, equity_curve = TradeSimulator().run(candles, signals, record_equity=True)
+    metrics = compute_metrics(tradelog, equity_curve)
+
+    assert metrics["total_trades"] == len(tradelog)
+    assert metrics["final_capital"] == tradelog["capital"].iloc[-1]
+    assert metrics["win_rate"] == pytest.approx((tradelog["PnL"] > 0).mean() * 100)
+    peak = np.maximum.accumulate(equity_curve["equity"])
+    assert metrics["bar_max_drawdown_percentage"] == pytest.approx(np.max(1 - equity_curve["equity"] / peak) * 100)
+
+
+def test_trade_with_nan_pnl_is_counted():
+    # The second trade bought on a NaN close, so its PnL and all later capital are NaN
+    pnl = np.array([0.10, np.nan, 0.05])
+    capital = np.array([1100.0, np.nan, np.nan])
+    metrics = trade_metrics(pnl, capital, 1000.0)
+
+    assert metrics["total_trades"] == 3
+    assert metrics["win_rate"] == pytest.approx(200 / 3)
+    assert metrics["avg_win"] == pytest.approx(0.075)
+    assert metrics["max_drawdown_percentage"] == 0.0
+    assert np.isnan(metrics["final_capital"])
+
+    padded = trade_metrics(np.vstack([pnl, [0.2, np.nan, np.nan]]), np.vstack([capital, [1200.0, np.nan, np.nan]]),
+                           1000.0, trade_counts=[3, 1])
+    assert padded["total_trades"].tolist() == [3, 1]
+    assert padded["win_rate"][0] == metrics["win_rate"]
+    assert padded["final_capital"][1] == 1200.0
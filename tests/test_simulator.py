@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from simulator import TradeSimulator
+
+
+def random_market(seed: int, n_bars: int = 400, nan_share: float = 0.05):
+    """Random-walk closes with some NaN bars and random BUY/SELL/HOLD signals"""
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2025-01-01", periods=n_bars, freq="h")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_bars)))
+    close[rng.random(n_bars) < nan_share] = np.nan
+    signal = rng.choice(["BUY", "SELL", "HOLD"], size=n_bars, p=[0.1, 0.1, 0.8])
+    return pd.DataFrame({"timestamp": timestamps, "close": close}), pd.DataFrame({"timestamp": timestamps, "signal": signal})
+
+
+def run_both(candles: pd.DataFrame, signals: pd.DataFrame):
+    loop = TradeSimulator(engine="loop").run(candles, signals, record_equity=True)
+    vectorized = TradeSimulator(engine="vectorized").run(candles, signals, record_equity=True)
+    return loop, vectorized
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_vectorized_engine_matches_loop(seed):
+    candles, signals = random_market(seed)
+    (loop_log, loop_equity), (vec_log, vec_equity) = run_both(candles, signals)
+
+    pd.testing.assert_frame_equal(vec_log, loop_log, check_exact=True)
+    np.testing.assert_array_equal(vec_equity["position"], loop_equity["position"])
+    # Unrounded, the two engines may differ in the last bit
+    for key in ("equity", "exposure"):
+        np.testing.assert_allclose(vec_equity[key], loop_equity[key], rtol=1e-12)
+
+
+def test_open_position_is_closed_on_last_bar():
+    candles, signals = random_market(0, n_bars=50, nan_share=0)
+    signals["signal"] = "HOLD"
+    signals.loc[10, "signal"] = "BUY"
+    (loop_log, _), (vec_log, _) = run_both(candles, signals)
+
+    pd.testing.assert_frame_equal(vec_log, loop_log, check_exact=True)
+    assert len(vec_log) == 1
+    assert vec_log["timestamp"].iloc[0] == candles["timestamp"].iloc[-1]
+    assert vec_log["exit_price"].iloc[0] == candles["close"].iloc[-1]
+
+
+def test_nan_final_close_exits_at_entry_price():
+    candles, signals = random_market(1, n_bars=50, nan_share=0)
+    candles.loc[len(candles) - 1, "close"] = np.nan
+    signals["signal"] = "HOLD"
+    signals.loc[len(signals) - 1, "signal"] = "BUY"
+    signals.loc[5, "signal"] = "BUY"
+    (loop_log, _), (vec_log, _) = run_both(candles, signals)
+
+    pd.testing.assert_frame_equal(vec_log, loop_log, check_exact=True)
+    assert vec_log["exit_price"].iloc[-1] == vec_log["entry_price"].iloc[-1]
+
+
+def test_no_signals_gives_empty_tradelog():
+    candles, signals = random_market(2, n_bars=30)
+    signals["signal"] = "HOLD"
+    (loop_log, _), (vec_log, vec_equity) = run_both(candles, signals)
+
+    assert loop_log.empty and vec_log.empty
+    assert (vec_equity["equity"] == 1000.0).all()
+
+
+def test_run_batch_matches_run():
+    candles, _ = random_market(3)
+    variants = [random_market(seed)[1]["signal"].to_numpy() for seed in range(10, 20)]
+    batch = TradeSimulator().run_batch(candles["close"], np.column_stack(variants))
+
+    for j, signal in enumerate(variants):
+        signals = pd.DataFrame({"timestamp": candles["timestamp"], "signal": signal})
+        tradelog = TradeSimulator(engine="loop").run(candles, signals)
+        assert batch["trade_count"][j] == len(tradelog)
+        if len(tradelog):
+            # NaN when the variant bought on a NaN close, in both engines
+            np.testing.assert_equal(np.round(batch["final_capital"][j], 2), tradelog["capital"].iloc[-1])
+
+
+def test_empty_input_gives_empty_tradelog():
+    candles, signals = random_market(4, n_bars=0)
+    (loop_log, loop_equity), (vec_log, vec_equity) = run_both(candles, signals)
+
+    assert loop_log.empty and vec_log.empty
+    for key in ("equity", "position", "exposure"):
+        assert len(vec_equity[key]) == len(loop_equity[key]) == 0
+
+    batch = TradeSimulator().run_batch(np.empty(0), np.empty((0, 3), dtype=np.int8))
+    assert batch["trade_count"].tolist() == [0, 0, 0]
+    assert batch["final_capital"].tolist() == [1000.0] * 3
@@ -0,0 +1,29 @@
+import os
+from stage_cache import StageCache
+
+
+def test_memo_computes_once(tmp_path):
+    cache = StageCache(str(tmp_path))
+    calls = []
+    compute = lambda: calls.append(1) or {"rows": 3}
+
+    first, key = cache.memo("load", {"data": 1}, compute)
+    second, same_key = cache.memo("load", {"data": 1}, compute)
+
+    assert first == second == {"rows": 3}
+    assert key == same_key
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_hit_survives_eviction_by_another_process(tmp_path, monkeypatch):
+    cache = StageCache(str(tmp_path))
+    key = cache.key("load", {"data": 1})
+    cache.put(key, [1, 2, 3])
+
+    def evicted(path, *args, **kwargs):
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", evicted)
+    assert cache.get(key) == (True, [1, 2, 3])
@@ -0,0 +1,187 @@
+"""
+Walk-forward evaluation: tune on a rolling train window, score on the window after it.
+
+Work shared between overlapping windows is done once. Candles are loaded once
+into the CandleStore. Each parameter combination generates its signals once over
+the full grid, and each window is a slice of that signal matrix. The long/flat
+state the full-history state machine is in at a window's first bar is carried
+into the window, so a position opened before the window starts is held from its
+first bar rather than dropped. Each window's train and test slices are
+simulated for every combination at once with TradeSimulator.run_batch, and
+windows run in parallel.
+
+Signals computed on the full grid equal those computed on each window's
+history only for strategies without look-ahead, which is what the backtest
+assumes anyway.
+
+Usage:
+    python walk_forward.py 1745423453 --param threshold=0.005,0.01,0.02 --train-bars 720 --test-bars 168
+"""
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from batch_runner import prepare_candle_source
+from candle_store import STORE_DIR
+from evaluation_runner import load_strategy_module
+from metrics import pad_trades, trade_metrics
+from param_sweep import _generate_signals, _init_worker, _parse_param, _worker, parameter_grid
+from simulator import SIGNAL_CODES, TradeSimulator, encode_signals, resolve_positions
+
+
+def walk_forward_windows(n_bars: int, train_bars: int, test_bars: int, step_bars: int = None) -> list:
+    """
+    Rolling (train_start, test_start, test_end) bar ranges; train is
+    [train_start, test_start) and test is [test_start, test_end).
+
+    step_bars may not be shorter than test_bars: overlapping test windows
+    would count the same bars more than once in the compounded out-of-sample
+    return.
+    """
+    step_bars = step_bars or test_bars
+    if step_bars < test_bars:
+        raise ValueError(f"step_bars ({step_bars}) must be at least test_bars ({test_bars}) so test windows do not overlap")
+    windows = []
+    test_start = train_bars
+    while test_start < n_bars:
+        windows.append((test_start - train_bars, test_start, min(test_start + test_bars, n_bars)))
+        test_start += step_bars
+    return windows
+
+
+def _signal_codes(params: dict) -> np.ndarray:
+    signals_df = _generate_signals(params)
+    if len(signals_df) != len(_worker["candles_target"]):
+        raise ValueError(f"Strategy returned {len(signals_df)} signal rows for {len(_worker['candles_target'])} bars")
+    return encode_signals(signals_df["signal"].to_numpy())
+
+
+def _window_codes(codes: np.ndarray, positions: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """codes[start:stop] with a BUY on the first bar for variants already long before start"""
+    window = codes[start:stop].copy()
+    if start > 0:
+        carried = positions[start - 1] & (window[0] != SIGNAL_CODES['SELL'])
+        window[0, carried] = SIGNAL_CODES['BUY']
+    return window
+
+
+def _score(close, codes, timestamps, initial_capital: float, fee_pct: float) -> dict:
+    result = TradeSimulator(initial_capital=initial_capital, fee_pct=fee_pct).run_batch(close, codes, timestamps)
+    offsets = result['trade_offsets']
+    metrics = trade_metrics(
+        pad_trades(result['PnL'], offsets),
+        pad_trades(result['capital'], offsets),
+        initial_capital,
+        pad_trades(result['timestamp'].astype('datetime64[ns]').view(np.int64), offsets, fill=0),
+        trade_counts=result['trade_count'],
+    )
+    metrics['final_capital'] = result['final_capital']
+    return metrics
+
+
+def _evaluate_window(window: tuple, close, codes, positions, timestamps, rank_by: str,
+                     initial_capital: float, fee_pct: float) -> dict:
+    """Picks the best combination on the train slice and scores it on the test slice"""
+    train_start, test_start, test_end = window
+    train = _score(
+        close[train_start:test_start], _window_codes(codes, positions, train_start, test_start),
+        timestamps[train_start:test_start], initial_capital, fee_pct,
+    )
+    ranking = np.nan_to_num(train[rank_by], nan=-np.inf)
+    best = int(np.argmax(ranking))
+
+    test_codes = _window_codes(codes[:, best:best + 1], positions[:, best:best + 1], test_start, test_end)
+    test = _score(close[test_start:test_end], test_codes, timestamps[test_start:test_end], initial_capital, fee_pct)
+    return {
+        "best": best,
+        "train": {name: values[best] for name, values in train.items()},
+        "test": {name: values[0] for name, values in test.items()},
+    }
+
+
+def run_walk_forward(strategy_name: str, grid: dict = None, train_bars: int = 720, test_bars: int = 168,
+                     step_bars: int = None, rank_by: str = "sharpe_ratio", max_workers: int = None,
+                     initial_capital: float = 1000.0, fee_pct: float = 0.001, store_root: str = STORE_DIR) -> dict:
+    """
+    Walk-forward evaluation of a strategy over rolling train/test windows.
+
+    Args:
+        strategy_name: name of the strategy file (without .py extension)
+        grid: {generate_signals kwarg: [values]} tuned on each train window;
+            None scores the strategy's defaults out of sample
+        train_bars, test_bars: window lengths in target bars
+        step_bars: distance between window starts (defaults to test_bars; at
+            least test_bars, larger values leave untested gaps)
+        rank_by: train-window metric to maximize when picking parameters
+
+    Returns:
+        dict with 'windows' (DataFrame: window bounds, chosen params, train and
+        test metrics), 'oos_final_capital' and 'oos_return_percentage' for the
+        test windows compounded back to back
+    """
+    combinations = parameter_grid(grid or {})
+    module = load_strategy_module(strategy_name)
+    target = module.get_coin_metadata().get("target", {})
+    candle_source = prepare_candle_source([strategy_name], store_root)
+    candles_target = candle_source.target_candles(target["symbol"], target.get("timeframe", "1h").lower())
+    close = candles_target["close"].to_numpy(dtype=np.float64)
+    timestamps = candles_target["timestamp"].to_numpy()
+
+    windows = walk_forward_windows(len(close), train_bars, test_bars, step_bars)
+    if not windows:
+        raise ValueError(f"Grid of {len(close)} bars is too short for a {train_bars}-bar train window")
+
+    initargs = (strategy_name, candle_source, initial_capital, fee_pct)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=initargs) as pool:
+        print(f"Generating signals for {len(combinations)} parameter combinations...")
+        codes = np.column_stack(list(pool.map(_signal_codes, combinations)))
+        positions = resolve_positions(codes)
+
+        print(f"Evaluating {len(windows)} walk-forward windows...")
+        futures = [
+            pool.submit(_evaluate_window, window, close, codes, positions, timestamps, rank_by,
+                        initial_capital, fee_pct)
+            for window in windows
+        ]
+        results = [future.result() for future in futures]
+
+    rows = []
+    oos_growth = 1.0
+    for (train_start, test_start, test_end), result in zip(windows, results):
+        oos_growth *= result["test"]["final_capital"] / initial_capital
+        rows.append({
+            "train_start": timestamps[train_start],
+            "test_start": timestamps[test_start],
+            "test_end": timestamps[test_end - 1],
+            **combinations[result["best"]],
+            **{f"train_{name}": value for name, value in result["train"].items() if name in (rank_by, "return_percentage", "total_trades")},
+            **{f"test_{name}": value for name, value in result["test"].items()},
+        })
+
+    return {
+        "windows": pd.DataFrame(rows),
+        "oos_final_capital": initial_capital * oos_growth,
+        "oos_return_percentage": (oos_growth - 1) * 100,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward evaluation of a strategy")
+    parser.add_argument("strategy_name")
+    parser.add_argument("--param", action="append", default=[], help="name=v1,v2,... (repeatable)")
+    parser.add_argument("--train-bars", type=int, default=720)
+    parser.add_argument("--test-bars", type=int, default=168)
+    parser.add_argument("--step-bars", type=int, default=None)
+    parser.add_argument("--rank-by", default="sharpe_ratio")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    grid = dict(_parse_param(spec) for spec in args.param)
+    report = run_walk_forward(args.strategy_name, grid, args.train_bars, args.test_bars, args.step_bars,
+                              args.rank_by, args.workers)
+    columns = ["test_start", "test_end"] + list(grid) + ["test_return_percentage", "test_max_drawdown_percentage", "test_total_trades"]
+    with pd.option_context("display.width", 200, "display.max_columns", 12):
+        print(report["windows"][columns])
+    print(f"Out-of-sample return: {report['oos_return_percentage']:.2f}%")
+    sys.exit(0)